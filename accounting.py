@@ -0,0 +1,216 @@
+"""Vectorized payout accounting over HENDao event histories.
+
+Replays a DAO's deposits, withdrawals, sales, purchases and payouts with
+NumPy and computes, for every owner after every event, the same numbers
+liquidate() works with: equity, the owner's share of real_total, what was
+already paid out, what is claimable and the cash P&L. One pass covers the
+whole history instead of one split_tokens call per owner and event:
+
+    python accounting.py dao1.jsonl dao2.jsonl --out payouts.csv
+    python accounting.py dao1.jsonl --out payouts.parquet
+
+Each line of a history is one event, with the contract's event tags:
+
+    {"level": 1500, "tag": "deposit", "payload": {"owner": "tz1...", "amount": "5000000"}}
+
+deposit, withdraw and liquidate carry (owner, amount), collect carries
+(swap_id, price) and vote_close carries (owner, vote, passed). default has
+no event, so incoming transfers are written as
+{"tag": "default", "payload": {"amount": ...}}. Other tags are kept in the
+output but don't change the accounting.
+
+Amounts are mutez and shares are rounded down exactly like sp.split_tokens.
+P&L only counts tez, NFTs the DAO still holds are worth nothing here.
+Parquet export needs pyarrow.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+# Largest value an int64 product may reach before falling back to exact Python ints
+INT64_MAX = np.iinfo(np.int64).max
+
+# Events that carry (owner, amount) and move that owner's equity or payouts
+OWNER_TAGS = ("deposit", "withdraw", "liquidate")
+
+COLUMNS = [
+    "dao", "event", "level", "tag", "owner", "equity", "total_contributed",
+    "real_total", "share", "paid_out", "claimable", "pnl",
+]
+
+
+class History:
+    """One DAO's events as NumPy arrays, indexed [event] or [event, owner]."""
+
+    def __init__(self, dao, events):
+        self.dao = dao
+        self.levels = np.array([int(event["level"]) for event in events], dtype=np.int64)
+        self.tags = [event["tag"] for event in events]
+
+        self.owners = []
+        owner_index = {}
+        for event in events:
+            if event["tag"] in OWNER_TAGS and event["payload"]["owner"] not in owner_index:
+                owner_index[event["payload"]["owner"]] = len(self.owners)
+                self.owners.append(event["payload"]["owner"])
+
+        num_events, num_owners = len(events), len(self.owners)
+        self.equity_delta = np.zeros((num_events, num_owners), dtype=np.int64)
+        self.paid_delta = np.zeros((num_events, num_owners), dtype=np.int64)
+        self.balance_delta = np.zeros(num_events, dtype=np.int64)
+        self.closes = np.zeros(num_events, dtype=bool)
+
+        for t, event in enumerate(events):
+            tag, payload = event["tag"], event.get("payload")
+            if tag == "deposit":
+                amount = int(payload["amount"])
+                self.equity_delta[t, owner_index[payload["owner"]]] = amount
+                self.balance_delta[t] = amount
+            elif tag == "withdraw":
+                amount = int(payload["amount"])
+                self.equity_delta[t, owner_index[payload["owner"]]] = -amount
+                self.balance_delta[t] = -amount
+            elif tag == "liquidate":
+                amount = int(payload["amount"])
+                self.paid_delta[t, owner_index[payload["owner"]]] = amount
+                self.balance_delta[t] = -amount
+            elif tag == "default":
+                self.balance_delta[t] = int(payload["amount"])
+            elif tag == "collect":
+                self.balance_delta[t] = -int(payload["price"])
+            elif tag == "vote_close":
+                self.closes[t] = bool(payload["passed"])
+
+    @classmethod
+    def load(cls, path, dao=None):
+        with open(path) as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        return cls(dao or os.path.splitext(os.path.basename(path))[0], events)
+
+
+def split_tokens(amount, quantity, total):
+    """sp.split_tokens on arrays, amount * quantity / total rounded down.
+
+    Uses int64 when every product fits and exact Python ints otherwise.
+    Where total is 0 the contract would fail, the result is 0 there.
+    """
+    amount, quantity, total = np.broadcast_arrays(amount, quantity, total)
+    safe_total = np.where(total == 0, 1, total)
+    if amount.size and int(amount.max()) * int(quantity.max()) > INT64_MAX:
+        product = amount.astype(object) * quantity.astype(object)
+        result = (product // safe_total.astype(object)).astype(np.int64)
+    else:
+        result = amount * quantity // safe_total
+    return np.where(total == 0, 0, result)
+
+
+def replay(history):
+    """Every owner's accounting after every event, as [event, owner] arrays."""
+    equity = np.cumsum(history.equity_delta, axis=0)
+    paid_out = np.cumsum(history.paid_delta, axis=0)
+    total_contributed = equity.sum(axis=1)
+    balance = np.cumsum(history.balance_delta)
+    # Same as liquidate(), what was paid out still counts towards the total
+    real_total = balance + paid_out.sum(axis=1)
+    closed = np.maximum.accumulate(history.closes) if history.closes.size else history.closes
+
+    share = split_tokens(equity, real_total[:, None], total_contributed[:, None])
+    # liquidate() fails rather than paying a negative amount, and only runs once closed
+    claimable = np.where(closed[:, None], np.maximum(share - paid_out, 0), 0)
+
+    return {
+        "equity": equity,
+        "total_contributed": total_contributed,
+        "real_total": real_total,
+        "share": share,
+        "paid_out": paid_out,
+        "claimable": claimable,
+        "pnl": share - equity,
+    }
+
+
+def final_state(history, result):
+    """Storage after the last event, to reconcile against the contract or indexer.
+
+    A history without events is a freshly originated DAO, everything is zero.
+    """
+    if not history.tags:
+        return {"equity": {}, "total_contributed": 0, "liquidated_ledger": {}}
+    return {
+        "equity": dict(zip(history.owners, result["equity"][-1].tolist())),
+        "total_contributed": int(result["total_contributed"][-1]),
+        "liquidated_ledger": dict(zip(history.owners, result["paid_out"][-1].tolist())),
+    }
+
+
+### Export ###
+def columns(history, result):
+    """Flatten [event, owner] arrays into one row per event and owner."""
+    num_events, num_owners = result["equity"].shape
+    event = np.repeat(np.arange(num_events), num_owners)
+    data = {
+        "dao": [history.dao] * (num_events * num_owners),
+        "event": event,
+        "level": history.levels[event],
+        "tag": [history.tags[t] for t in event],
+        "owner": history.owners * num_events,
+    }
+    for name, values in result.items():
+        # Per event totals are repeated for every owner
+        per_owner = values[:, None] if values.ndim == 1 else values
+        data[name] = np.broadcast_to(per_owner, (num_events, num_owners)).ravel()
+    return data
+
+
+def write_csv(path, tables):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for data in tables:
+            writer.writerows(zip(*(
+                data[name].tolist() if isinstance(data[name], np.ndarray) else data[name]
+                for name in COLUMNS
+            )))
+
+
+def write_parquet(path, tables):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow, pip install pyarrow or write a .csv")
+    merged = {
+        name: np.concatenate([np.asarray(data[name]) for data in tables]) if tables else []
+        for name in COLUMNS
+    }
+    pyarrow.parquet.write_table(pyarrow.table(merged), path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay HENDao event histories into payout accounting")
+    parser.add_argument("histories", nargs="+", help="JSONL event history, one file per DAO")
+    parser.add_argument("--out", default="payouts.csv", help=".csv or .parquet")
+    args = parser.parse_args(argv)
+
+    tables = []
+    for path in args.histories:
+        history = History.load(path)
+        result = replay(history)
+        tables.append(columns(history, result))
+        state = final_state(history, result)
+        print("%s: %d events, %d owners, total_contributed %d" % (
+            history.dao, len(history.tags), len(history.owners), state["total_contributed"]), file=sys.stderr)
+
+    if args.out.endswith(".parquet"):
+        write_parquet(args.out, tables)
+    else:
+        write_csv(args.out, tables)
+
+
+if __name__ == "__main__":
+    main()
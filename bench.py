@@ -0,0 +1,523 @@
+"""Gas and storage benchmarks for HENDao.
+
+Compiles contract.py with SmartPy, originates it in an octez-client mockup
+(no node or network needed) and drives every entrypoint at growing owner
+counts and proposal backlog sizes. Consumed gas, paid storage and fees of
+each operation are written to a JSON file so two contract versions can be
+compared number by number.
+
+    python bench.py --owners 2 20 200 --backlog 0 100 --out bench_output.json
+
+Two outputs can then be compared per entrypoint:
+
+    python bench.py --compare before.json after.json
+
+The code and initial storage size of every compilation target in
+contract.py against the origination size limit, and the cost of originating
+a DAO directly and through the factory:
+
+    python bench.py --sizes
+
+Entrypoint arguments are encoded from the parameter type of the compiled
+contract, so older versions of contract.py can be benchmarked too. Calls to
+entrypoints the compiled contract doesn't have are skipped.
+
+Requires SmartPy.sh and octez-client on the PATH (or --smartpy/--octez-client).
+"""
+
+import argparse
+import collections
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+# Largest operation the protocol accepts (max_operation_data_length), an
+# origination has to fit its code and initial storage in it
+MAX_OPERATION_BYTES = 32768
+
+# Mainnet addresses compiled into HENDao's storage, swapped for the stub
+HEN_ADDRESS = "KT1HbQepzV1nVGg8QVznG7z4RcHseD5kwqBn"
+HEN_NFT_ADDRESS = "KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton"
+
+WRAPPER = """import smartpy as sp
+
+dao = sp.io.import_script_from_url("file:{contract}")
+
+sp.add_compilation_target("stub", dao.HENStubTester())
+sp.add_compilation_target("dao", dao.HENDao([{owners}]{options}))
+"""
+
+
+class Mockup:
+    """Thin wrapper around octez-client running in mockup mode."""
+
+    def __init__(self, octez_client, base_dir):
+        self.octez_client = octez_client
+        self.base_dir = base_dir
+        self.run("create", "mockup")
+
+    def run(self, *args):
+        cmd = [self.octez_client, "--mode", "mockup", "--base-dir", self.base_dir] + list(args)
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError("%s failed:\n%s" % (" ".join(cmd), result.stderr or result.stdout))
+        return result.stdout
+
+    def gen_key(self, alias):
+        """Returns the new key's address and public key."""
+        self.run("gen", "keys", alias, "--force")
+        output = self.run("show", "address", alias)
+        return re.search(r"Hash: (tz\w+)", output).group(1), re.search(r"Public Key: (\w+)", output).group(1)
+
+    def fund(self, addresses, tez):
+        transfers = [{"destination": address, "amount": str(tez)} for address in addresses]
+        self.run("multiple", "transfers", "from", "bootstrap1", "using", json.dumps(transfers), "--burn-cap", "10")
+
+    def originate(self, alias, code_path, storage):
+        output = self.run(
+            "originate", "contract", alias, "transferring", "0", "from", "bootstrap1",
+            "running", code_path, "--init", storage, "--burn-cap", "100", "--force"
+        )
+        address = re.search(r"New contract (KT1\w+) originated", output).group(1)
+        return address, parse_receipt(output)
+
+    def call(self, source, contract, entrypoint=None, arg=None, amount=0):
+        args = ["transfer", str(amount), "from", source, "to", contract, "--burn-cap", "10"]
+        if entrypoint is not None:
+            args += ["--entrypoint", entrypoint]
+        if arg is not None:
+            args += ["--arg", arg]
+        return parse_receipt(self.run(*args))
+
+    def pack(self, data, data_type):
+        output = self.run("hash", "data", data, "of", "type", data_type)
+        return re.search(r"Raw packed data: (0x[0-9a-f]+)", output).group(1)
+
+    def sign(self, alias, packed):
+        output = self.run("sign", "bytes", packed, "for", alias)
+        return re.search(r"Signature: (\w+)", output).group(1)
+
+    def binary_size(self, source, kind):
+        """Bytes of a script (file or literal) or data in binary Michelson, as it is sent on chain."""
+        output = self.run("convert", kind, source, "from", "michelson", "to", "binary")
+        return (len(output.strip()) - 2) // 2
+
+
+def parse_receipt(output):
+    """Sum up gas, paid storage and fee from an octez-client receipt.
+
+    storage_bytes is the called contract's storage size after the operation,
+    the first one in the receipt since internal operations come after it.
+    """
+    gas = sum(float(value) for value in re.findall(r"Consumed gas: ([\d.]+)", output))
+    storage = sum(int(value) for value in re.findall(r"Paid storage size diff: (-?\d+) bytes", output))
+    size = re.search(r"Storage size: (\d+) bytes", output)
+    fee = re.search(r"Fee to the baker: \D*([\d.]+)", output)
+    # Paid storage and the allocation of new contracts are both burnt as storage fees
+    burn = sum(float(value) for value in re.findall(r"storage fees \.+ \+\D*([\d.]+)", output))
+    return {
+        "gas": gas,
+        "paid_storage_bytes": storage,
+        "storage_bytes": int(size.group(1)) if size else None,
+        "fee_tez": float(fee.group(1)) if fee else 0.0,
+        "burn_tez": burn,
+    }
+
+
+def compile_contracts(smartpy, contract, owners, lazy, work_dir):
+    """Compile the stub and a HENDao with the given owners, return their files."""
+    wrapper = os.path.join(work_dir, "bench_targets.py")
+    with open(wrapper, "w") as f:
+        f.write(WRAPPER.format(
+            contract=os.path.abspath(contract),
+            owners=", ".join('sp.address("%s")' % owner for owner in owners),
+            # Versions of HENDao without the option still compile
+            options=", lazy_entry_points=True" if lazy else "",
+        ))
+
+    out_dir = os.path.join(work_dir, "out")
+    result = subprocess.run([smartpy, "compile", wrapper, out_dir], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError("SmartPy compile failed:\n%s" % (result.stderr or result.stdout))
+
+    def target(name, kind):
+        return glob.glob(os.path.join(out_dir, name, "*_%s.tz" % kind))[0]
+
+    return {
+        "stub_code": target("stub", "contract"),
+        "dao_code": target("dao", "contract"),
+        "dao_storage": target("dao", "storage"),
+    }
+
+
+def code_sizes(args):
+    """Size of every compilation target in contract.py and what originating a DAO costs.
+
+    Returns the binary code and initial storage size of each target, and the
+    receipts of originating henDao directly, originating henDaoFactory and
+    creating a two owner DAO through the factory.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        out_dir = os.path.join(work_dir, "out")
+        result = subprocess.run([args.smartpy, "compile", args.contract, out_dir], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError("SmartPy compile failed:\n%s" % (result.stderr or result.stdout))
+
+        mockup = Mockup(args.octez_client, os.path.join(work_dir, "client"))
+        targets, sizes = {}, {}
+        for code_path in sorted(glob.glob(os.path.join(out_dir, "*", "*_contract.tz"))):
+            name = os.path.basename(os.path.dirname(code_path))
+            with open(glob.glob(os.path.join(os.path.dirname(code_path), "*_storage.tz"))[0]) as f:
+                storage = f.read().strip()
+            targets[name] = (code_path, storage)
+            sizes[name] = {
+                "code_bytes": mockup.binary_size(code_path, "script"),
+                "storage_bytes": mockup.binary_size(storage, "data"),
+            }
+
+        originations, addresses = {}, {}
+        for name in ("henDao", "henDaoFactory"):
+            if name in targets:
+                addresses[name], originations["originate " + name] = mockup.originate(name, *targets[name])
+        if "henDaoFactory" in targets:
+            params = entrypoints(parameter_type(targets["henDaoFactory"][0]))
+            owners = [mockup.gen_key(alias)[0] for alias in ("owner0", "owner1")]
+            originations["create_dao"] = mockup.call("bootstrap1", addresses["henDaoFactory"], "create_dao", encode(
+                params["create_dao"], {"owners": owners, "proposal_lifetime": None, "metadata_url": None}
+            ))
+        return sizes, originations
+
+
+def print_sizes(sizes, originations):
+    print("%-16s %10s %13s %10s" % ("target", "code", "storage", "of limit"))
+    for name, size in sorted(sizes.items()):
+        total = size["code_bytes"] + size["storage_bytes"]
+        print("%-16s %10d %13d %9.1f%%" % (name, size["code_bytes"], size["storage_bytes"], total / MAX_OPERATION_BYTES * 100))
+    print()
+    print("%-24s %12s %13s %10s %10s" % ("operation", "gas", "paid storage", "burn", "fee"))
+    for name, receipt in originations.items():
+        print("%-24s %12.1f %13d %10.6f %10.6f" % (
+            name, receipt["gas"], receipt["paid_storage_bytes"], receipt["burn_tez"], receipt["fee_tez"]))
+
+
+### Michelson ###
+# Just enough of a Michelson type parser to find the entrypoints of a
+# compiled contract and encode their arguments from Python values
+
+TOKEN = re.compile(r'\s*(?:#[^\n]*|("(?:[^"\\]|\\.)*"|[(){};]|[^\s(){};]+))')
+
+# A type expression, annot is its field annotation without the %
+MichelsonType = collections.namedtuple("MichelsonType", ["prim", "args", "annot"])
+
+
+def tokenize(source):
+    return [token for token in TOKEN.findall(source) if token]
+
+
+def parse_type(tokens, i=0):
+    """Parse the type expression at tokens[i], returns (type, next index)."""
+    if tokens[i] != "(":
+        return MichelsonType(tokens[i], (), None), i + 1
+    prim, i = tokens[i + 1], i + 2
+    args, annot = [], None
+    while tokens[i] != ")":
+        if tokens[i][0] in "%:@":
+            if tokens[i][0] == "%" and annot is None:
+                annot = tokens[i][1:]
+            i += 1
+        else:
+            arg, i = parse_type(tokens, i)
+            args.append(arg)
+    return MichelsonType(prim, tuple(args), annot), i + 1
+
+
+def parameter_type(code_path):
+    with open(code_path) as f:
+        tokens = tokenize(f.read())
+    return parse_type(tokens, tokens.index("parameter") + 1)[0]
+
+
+def entrypoints(param):
+    """{name: argument type} for every annotated branch of the parameter."""
+    if param.annot is not None:
+        return {param.annot: param}
+    if param.prim != "or":
+        return {}
+    found = {}
+    for arg in param.args:
+        found.update(entrypoints(arg))
+    return found
+
+
+def field_type(t, name):
+    """The type of field name in the record type t, None if it has no such field."""
+    for arg in t.args if t.prim == "pair" else ():
+        if arg.annot == name:
+            return arg
+        if arg.annot is None:
+            found = field_type(arg, name)
+            if found is not None:
+                return found
+    return None
+
+
+def render_type(t):
+    if not t.args and t.annot is None:
+        return t.prim
+    annot = " %" + t.annot if t.annot is not None else ""
+    return "(%s%s%s)" % (t.prim, annot, "".join(" " + render_type(arg) for arg in t.args))
+
+
+def variant_path(t, case):
+    """The Left/Right steps to the branch annotated case, or None."""
+    if t.prim != "or":
+        return None
+    for side, arg in zip(("Left", "Right"), t.args):
+        if arg.annot == case:
+            return [side], arg
+        found = variant_path(arg, case) if arg.annot is None else None
+        if found is not None:
+            return [side] + found[0], found[1]
+    return None
+
+
+def encode(t, value):
+    """Encode value as Michelson data of type t.
+
+    Records are dicts by field name, variants are (case, value) tuples and
+    lists and sets are Python lists. Raises KeyError for a missing field.
+    """
+    if t.prim in ("nat", "int", "mutez"):
+        return str(value)
+    if t.prim in ("string", "address", "key", "key_hash", "signature", "timestamp"):
+        return '"%s"' % value
+    if t.prim == "bool":
+        return "True" if value else "False"
+    if t.prim == "unit":
+        return "Unit"
+    if t.prim == "bytes":
+        return value
+    if t.prim == "option":
+        return "None" if value is None else "(Some %s)" % encode(t.args[0], value)
+    if t.prim in ("list", "set"):
+        items = sorted(value) if t.prim == "set" else value
+        return "{%s}" % "; ".join(encode(t.args[0], item) for item in items)
+    if t.prim == "pair":
+        return "(Pair %s)" % " ".join(encode_field(arg, value) for arg in t.args)
+    if t.prim == "or":
+        case, arg = value
+        found = variant_path(t, case)
+        if found is None:
+            raise KeyError(case)
+        steps, branch = found
+        data = encode(branch, arg)
+        for side in reversed(steps):
+            data = "(%s %s)" % (side, data)
+        return data
+    raise ValueError("can't encode %s" % t.prim)
+
+
+def encode_field(t, record):
+    # Unannotated pairs are nested parts of the same record
+    if t.annot is None and t.prim == "pair":
+        return encode(t, record)
+    return encode(t, record[t.annot])
+
+
+def run_case(args, num_owners, backlog):
+    """Originate a fresh DAO and record every entrypoint call."""
+    records = []
+    skipped = set()
+
+    def record(entrypoint, receipt, **extra):
+        row = {"entrypoint": entrypoint, "owners": num_owners, "backlog": backlog}
+        row.update(extra)
+        row.update(receipt)
+        records.append(row)
+
+    def available(*names):
+        missing = [name for name in names if name not in params]
+        for name in set(missing) - skipped:
+            print("skipping %s, not in the compiled contract" % name, file=sys.stderr)
+            skipped.add(name)
+        return not missing
+
+    def call(sender, entrypoint, value=None, amount=0, **extra):
+        """Call an entrypoint and record it, skipped if the contract doesn't have it."""
+        if not available(entrypoint):
+            return None
+        receipt = mockup.call(sender, dao, entrypoint, encode(params[entrypoint], value), amount=amount)
+        record(entrypoint, receipt, sender=sender, **extra)
+        return receipt
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        mockup = Mockup(args.octez_client, os.path.join(work_dir, "mockup"))
+
+        aliases = ["owner%d" % i for i in range(num_owners)]
+        keys = [mockup.gen_key(alias) for alias in aliases]
+        owners = [address for address, _ in keys]
+        mockup.fund(owners, 1000)
+
+        files = compile_contracts(args.smartpy, args.contract, owners, args.lazy, work_dir)
+        params = entrypoints(parameter_type(files["dao_code"]))
+
+        stub, _ = mockup.originate("stub", files["stub_code"], "Unit")
+        with open(files["dao_storage"]) as f:
+            storage = f.read().replace(HEN_ADDRESS, stub).replace(HEN_NFT_ADDRESS, stub)
+        dao, receipt = mockup.originate("dao", files["dao_code"], storage)
+        record("origination", receipt)
+
+        first, last = aliases[0], aliases[-1]
+
+        for alias in aliases:
+            call(alias, "deposit", None, amount=10)
+        call(first, "withdraw", 1000000)
+
+        for alias in aliases:
+            call(alias, "vote_lock", True)
+
+        # Fill the proposal big_maps before measuring the votes
+        for swap_id in range(1000, 1000 + backlog):
+            mockup.call(first, dao, "vote_buy", encode(params["vote_buy"], {"swap_id": swap_id, "price": 0}))
+
+        for alias in aliases:
+            call(alias, "vote_buy", {"swap_id": 0, "price": 0})
+        call(first, "vote_buy", {"swap_id": 1, "price": 0})
+        call(first, "undo_vote_buy", 1)
+
+        # The same three purchases as separate vote_buy rounds and as one sweep,
+        # only when both halves can run so the comparison stays paired
+        if available("propose_sweep", "vote_sweep"):
+            for swap_id in (2, 3, 4):
+                for alias in aliases:
+                    call(alias, "vote_buy", {"swap_id": swap_id, "price": 0}, compare="sweep")
+            call(first, "propose_sweep", {"items": [{"swap_id": swap_id, "price": 0} for swap_id in (5, 6, 7)], "cap": 0}, compare="sweep")
+            for alias in aliases:
+                call(alias, "vote_sweep", 0, compare="sweep")
+
+        for alias in aliases:
+            call(alias, "vote_cancel_swap", 8)
+
+        # A buy and a cancel in one operation per owner, the last one passes both
+        for alias in aliases:
+            call(alias, "vote_batch", [("vote_buy", {"swap_id": 9, "price": 0}), ("vote_cancel_swap", 10)])
+
+        swap = {"creator": owners[0], "objkt_amount": 1, "objkt_id": 123, "xtz_per_objkt": 100}
+        call(first, "propose_swap", swap)
+        for alias in aliases:
+            call(alias, "vote_swap", 0)
+
+        # The same three listings as separate propose_swap rounds and as one bundle,
+        # each on new tokens so both pay for granting the operator
+        if available("propose_swaps"):
+            for swap_proposal_id, objkt_id in ((1, 124), (2, 125), (3, 126)):
+                call(first, "propose_swap", dict(swap, objkt_id=objkt_id), compare="propose_swaps")
+                for alias in aliases:
+                    call(alias, "vote_swap", swap_proposal_id, compare="propose_swaps")
+            call(first, "propose_swaps", [dict(swap, objkt_id=objkt_id) for objkt_id in (127, 128, 129)], compare="propose_swaps")
+            for alias in aliases:
+                call(alias, "vote_swap", 4, compare="propose_swaps")
+
+        # Every owner signs the same buy off-chain, any account relays it
+        if available("execute_signed"):
+            action = ("buy", {"swap_id": 11, "price": 0})
+            action_type = field_type(params["execute_signed"], "action")
+            # pack(record(contract, action, nonce)), the nonces are all 0
+            packed = mockup.pack(
+                "(Pair %s (Pair \"%s\" 0))" % (encode(action_type, action), dao),
+                "(pair %s (pair address nat))" % render_type(action_type)
+            )
+            signatures = [
+                {"public_key": public_key, "signature": mockup.sign(alias, packed)}
+                for alias, (_, public_key) in zip(aliases, keys)
+            ]
+            call("bootstrap2", "execute_signed", {"action": action, "signatures": signatures})
+
+        # Free the passed buy and swap proposals, every owner voted on them.
+        # Deletions aren't refunded, so what pruning gives back only shows up
+        # in the storage size against the previous call
+        size_before = records[-1]["storage_bytes"]
+        receipt = call(first, "prune_proposals", [
+            {"proposal": ("buy", 0), "voters": owners},
+            {"proposal": ("swap", 0), "voters": owners},
+        ])
+        if receipt is not None and size_before is not None and receipt["storage_bytes"] is not None:
+            records[-1]["storage_reclaimed_bytes"] = size_before - receipt["storage_bytes"]
+
+        # Sale proceeds arrive through default
+        record("default", mockup.call("bootstrap2", dao, amount=1))
+
+        for alias in aliases:
+            call(alias, "vote_close", True)
+        call(last, "liquidate", None)
+        call(first, "liquidate_all", {"start": 0, "limit": num_owners})
+
+    return records
+
+
+def mean_gas(path):
+    """Mean gas of each (entrypoint, owners, backlog) in a bench output.
+
+    Calls made for a comparison are kept apart, as "vote_swap/propose_swaps".
+    """
+    with open(path) as f:
+        records = json.load(f)["records"]
+    totals = {}
+    for row in records:
+        entrypoint = row["entrypoint"] + ("/" + row["compare"] if "compare" in row else "")
+        key = (entrypoint, row["owners"], row["backlog"])
+        total, count = totals.get(key, (0.0, 0))
+        totals[key] = (total + row["gas"], count + 1)
+    return {key: total / count for key, (total, count) in totals.items()}
+
+
+def compare(before_path, after_path):
+    """Print the gas of every entrypoint before and after a change."""
+    before = mean_gas(before_path)
+    after = mean_gas(after_path)
+    print("%-32s %6s %7s %12s %12s %8s" % ("entrypoint", "owners", "backlog", "before", "after", "change"))
+    for key in sorted(set(before) & set(after)):
+        change = (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        print("%-32s %6d %7d %12.1f %12.1f %+7.2f%%" % (key + (before[key], after[key], change)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--owners", type=int, nargs="+", default=[2, 20, 200])
+    parser.add_argument("--backlog", type=int, nargs="+", default=[0, 100])
+    parser.add_argument("--contract", default="contract.py", help="contract version to benchmark")
+    parser.add_argument("--lazy", action="store_true", help="benchmark the lazy entry point build")
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--smartpy", default="SmartPy.sh")
+    parser.add_argument("--octez-client", default="octez-client")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two outputs instead of benchmarking")
+    parser.add_argument("--sizes", action="store_true", help="print the size of every compilation target instead of benchmarking")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.sizes:
+        print_sizes(*code_sizes(args))
+        return
+
+    records = []
+    for num_owners in args.owners:
+        for backlog in args.backlog:
+            print("owners=%d backlog=%d" % (num_owners, backlog), file=sys.stderr)
+            records += run_case(args, num_owners, backlog)
+
+    with open(args.out, "w") as f:
+        json.dump({
+            "contract": args.contract,
+            "lazy": args.lazy,
+            "records": records,
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,91 @@
 import smartpy as sp
 
+# A single HEN listing, swap proposals hold a list of these
+SWAP_TYPE = sp.TRecord(
+    objkt_amount=sp.TNat,
+    objkt_id=sp.TNat,
+    xtz_per_objkt=sp.TMutez,
+    creator=sp.TAddress
+)
+
+# Parameter of HEN's swap entrypoint
+HEN_SWAP_TYPE = sp.TRecord(
+    creator=sp.TAddress,
+    objkt_amount=sp.TNat,
+    objkt_id=sp.TNat,
+    royalties=sp.TNat,
+    xtz_per_objkt=sp.TMutez
+)
+
+# FA2 update_operators parameter
+OPERATOR_TYPE = sp.TRecord(owner=sp.TAddress, operator=sp.TAddress, token_id=sp.TNat).layout(("owner", ("operator", "token_id")))
+OPERATOR_UPDATE_TYPE = sp.TVariant(
+    add_operator=OPERATOR_TYPE,
+    remove_operator=OPERATOR_TYPE
+)
+
+# The DAO's current HEN listing of an objkt
+# swap_id is none until an owner registers it, HEN doesn't return it to the caller
+LISTING_TYPE = sp.TRecord(
+    swap=SWAP_TYPE,
+    swap_proposal_id=sp.TNat,
+    swap_id=sp.TOption(sp.TNat)
+)
+
+# A single HEN purchase, sweep proposals hold a list of these
+SWEEP_ITEM_TYPE = sp.TRecord(
+    swap_id=sp.TNat,
+    price=sp.TMutez
+)
+
+# Standing buy policy, once every owner approves it any single owner can
+# collect any swap with an id of at least min_swap_id until expiry (a level).
+# HEN numbers swaps in order, so the floor admits swaps made after the vote.
+# Trust model: one owner alone can spend up to spend_cap in total, at most
+# max_price per collect, on swaps nobody else reviewed, including their own
+BUDGET_TYPE = sp.TRecord(
+    max_price=sp.TMutez,
+    spend_cap=sp.TMutez,
+    min_swap_id=sp.TNat,
+    expiry=sp.TNat
+)
+
+# Refers to a proposal of any kind
+PROPOSAL_REF_TYPE = sp.TVariant(
+    buy=sp.TNat,
+    swap=sp.TNat,
+    cancel_swap=sp.TNat,
+    clear_listing=sp.TNat,
+    budget=sp.TNat,
+    sweep=sp.TNat
+)
+
+# Tally of a buy or cancel_swap proposal, the other kinds add their content to it
+# created is the level the proposal was made at, used for expiry
+PROPOSAL_TYPE = sp.TRecord(num_votes=sp.TNat, passed=sp.TBool, created=sp.TNat)
+SWAP_PROPOSAL_TYPE = sp.TRecord(swaps=sp.TList(SWAP_TYPE), num_votes=sp.TNat, passed=sp.TBool, created=sp.TNat)
+SWEEP_PROPOSAL_TYPE = sp.TRecord(
+    items=sp.TList(SWEEP_ITEM_TYPE),
+    cap=sp.TMutez,
+    num_votes=sp.TNat,
+    passed=sp.TBool,
+    created=sp.TNat
+)
+BUDGET_PROPOSAL_TYPE = sp.TRecord(policy=BUDGET_TYPE, num_votes=sp.TNat, passed=sp.TBool, created=sp.TNat)
+
+# An approved budget with what was spent so far
+BUDGET_STATE_TYPE = sp.TRecord(policy=BUDGET_TYPE, spent=sp.TMutez)
+
+# One (proposal_id, address) entry per vote
+BALLOT_KEY_TYPE = sp.TPair(sp.TNat, sp.TAddress)
+BALLOTS_TYPE = sp.TBigMap(BALLOT_KEY_TYPE, sp.TUnit)
+
+# One ("lock" or "close", address) entry per phase vote
+PHASE_BALLOT_KEY_TYPE = sp.TPair(sp.TString, sp.TAddress)
+
 # This class is only used in tests to emulate the HEN minter contract
-# TODO stub out swap, collect, cancel_swap
+# It accepts the same collect/swap/cancel_swap/update_operators calls
+# as HEN so it can stand in for both hen_address and hen_nft_address
 class HENStubTester(sp.Contract):
     def __init__(self):
         self.init()
@@ -10,30 +94,180 @@ class HENStubTester(sp.Contract):
     def simulate_purchase(self, amount, dest):
         sp.send(dest, amount)
 
+    @sp.entry_point
+    def collect(self, swap_id):
+        sp.set_type(swap_id, sp.TNat)
+
+    @sp.entry_point
+    def swap(self, params):
+        sp.set_type(params, HEN_SWAP_TYPE)
+
+    @sp.entry_point
+    def cancel_swap(self, swap_id):
+        sp.set_type(swap_id, sp.TNat)
+
+    @sp.entry_point
+    def update_operators(self, params):
+        sp.set_type(params, sp.TList(OPERATOR_UPDATE_TYPE))
+
+# Nest fields as a balanced pair tree
+def balanced_layout(fields):
+    if len(fields) == 1:
+        return fields[0]
+    half = len(fields) // 2
+    return (balanced_layout(fields[:half]), balanced_layout(fields[half:]))
+
+# HENDao storage with an explicit layout
+# owners, numOwners, locked and closed are read by nearly every entrypoint,
+# so they sit at depth 2 and 3 of the pair tree. SmartPy's default layout
+# sorts the fields by name and balances them, which left them 5 to 6 deep
+# and scattered. Everything else is balanced below them
+DAO_STORAGE_TYPE = sp.TRecord(
+    owners=sp.TBigMap(sp.TAddress, sp.TUnit),
+    numOwners=sp.TNat,
+    locked=sp.TBool,
+    closed=sp.TBool,
+    owner_index=sp.TBigMap(sp.TNat, sp.TAddress),
+    phase_ballots=sp.TBigMap(PHASE_BALLOT_KEY_TYPE, sp.TUnit),
+    lock_votes=sp.TNat,
+    close_votes=sp.TNat,
+    total_contributed=sp.TMutez,
+    total_liquidated=sp.TMutez,
+    liquidated_ledger=sp.TBigMap(sp.TAddress, sp.TMutez),
+    equity=sp.TBigMap(sp.TAddress, sp.TMutez),
+    buy_proposals=sp.TBigMap(sp.TNat, PROPOSAL_TYPE),
+    buy_ballots=BALLOTS_TYPE,
+    swap_proposals=sp.TBigMap(sp.TNat, SWAP_PROPOSAL_TYPE),
+    swap_ballots=BALLOTS_TYPE,
+    reprices=sp.TBigMap(sp.TNat, sp.TNat),
+    listings=sp.TBigMap(sp.TNat, LISTING_TYPE),
+    listing_swap_ids=sp.TBigMap(sp.TNat, sp.TNat),
+    clear_listing_proposals=sp.TBigMap(sp.TNat, PROPOSAL_TYPE),
+    clear_listing_ballots=BALLOTS_TYPE,
+    cancel_swap_proposals=sp.TBigMap(sp.TNat, PROPOSAL_TYPE),
+    cancel_swap_ballots=BALLOTS_TYPE,
+    swap_proposal_id=sp.TNat,
+    sweep_proposals=sp.TBigMap(sp.TNat, SWEEP_PROPOSAL_TYPE),
+    sweep_ballots=BALLOTS_TYPE,
+    sweep_proposal_id=sp.TNat,
+    budget_proposals=sp.TBigMap(sp.TNat, BUDGET_PROPOSAL_TYPE),
+    budget_ballots=BALLOTS_TYPE,
+    budget_proposal_id=sp.TNat,
+    budgets=sp.TBigMap(sp.TNat, BUDGET_STATE_TYPE),
+    proposal_lifetime=sp.TOption(sp.TNat),
+    hen_operators=sp.TBigMap(sp.TNat, sp.TUnit),
+    nonces=sp.TBigMap(sp.TAddress, sp.TNat),
+    hen_address=sp.TAddress,
+    hen_nft_address=sp.TAddress,
+    metadata=sp.TBigMap(sp.TString, sp.TBytes)
+).layout((
+    ("owners", "numOwners"),
+    (("locked", "closed"), balanced_layout([
+        "owner_index", "phase_ballots", "lock_votes", "close_votes",
+        "total_contributed", "total_liquidated", "liquidated_ledger", "equity",
+        "buy_proposals", "buy_ballots",
+        "swap_proposals", "swap_ballots", "swap_proposal_id",
+        "reprices", "listings", "listing_swap_ids",
+        "clear_listing_proposals", "clear_listing_ballots",
+        "cancel_swap_proposals", "cancel_swap_ballots",
+        "sweep_proposals", "sweep_ballots", "sweep_proposal_id",
+        "budget_proposals", "budget_ballots", "budget_proposal_id", "budgets",
+        "proposal_lifetime", "hen_operators", "nonces",
+        "hen_address", "hen_nft_address", "metadata"
+    ]))
+))
+
+# Initial HENDao storage
+# Shared by HENDao and HENDaoFactory so both build the same record,
+# the arguments are constants for HENDao and expressions for the factory
+def dao_storage(owners, num_owners, owner_index, proposal_lifetime, metadata):
+    return dict(
+        # Owners live in a big_map so membership checks only load the sender,
+        # numOwners is the only source for the number of owners
+        owners=owners,
+        numOwners=num_owners,
+        # Gives owners a stable order for liquidate_all
+        owner_index=owner_index,
+        locked=False,
+        closed=False,
+        # Phase votes work like proposal ballots, a big_map entry per vote and a
+        # counter, so vote_lock and vote_close don't load every voter's address
+        phase_ballots=sp.big_map({}, PHASE_BALLOT_KEY_TYPE, sp.TUnit),
+        lock_votes=sp.nat(0),
+        close_votes=sp.nat(0),
+        total_contributed=sp.mutez(0),
+        total_liquidated=sp.mutez(0),
+        liquidated_ledger=sp.big_map({}, sp.TAddress, sp.TMutez),
+        equity=sp.big_map({}, sp.TAddress, sp.TMutez),
+        # Proposals only keep a tally, each vote lives in its own
+        # (proposal_id, address) ballot so voting cost doesn't grow with owners
+        buy_proposals=sp.big_map({}, sp.TNat, PROPOSAL_TYPE),
+        buy_ballots=sp.big_map({}, BALLOT_KEY_TYPE, sp.TUnit),
+        swap_proposals=sp.big_map({}, sp.TNat, SWAP_PROPOSAL_TYPE),
+        swap_ballots=sp.big_map({}, BALLOT_KEY_TYPE, sp.TUnit),
+        # Swap proposals made by propose_reprice, with the objkt_id whose listing they replace
+        reprices=sp.big_map({}, sp.TNat, sp.TNat),
+        # Latest listing of each objkt_id and the objkt_id of each registered swap_id,
+        # updated when swaps and cancels are sent to HEN
+        listings=sp.big_map({}, sp.TNat, LISTING_TYPE),
+        listing_swap_ids=sp.big_map({}, sp.TNat, sp.TNat),
+        # Votes to drop a sold out listing, keyed by its registered swap_id
+        clear_listing_proposals=sp.big_map({}, sp.TNat, PROPOSAL_TYPE),
+        clear_listing_ballots=sp.big_map({}, BALLOT_KEY_TYPE, sp.TUnit),
+        cancel_swap_proposals=sp.big_map({}, sp.TNat, PROPOSAL_TYPE),
+        cancel_swap_ballots=sp.big_map({}, BALLOT_KEY_TYPE, sp.TUnit),
+        swap_proposal_id=sp.nat(0),
+        # Several buys approved in one round, passed means every item was collected
+        sweep_proposals=sp.big_map({}, sp.TNat, SWEEP_PROPOSAL_TYPE),
+        sweep_ballots=sp.big_map({}, BALLOT_KEY_TYPE, sp.TUnit),
+        sweep_proposal_id=sp.nat(0),
+        budget_proposals=sp.big_map({}, sp.TNat, BUDGET_PROPOSAL_TYPE),
+        budget_ballots=sp.big_map({}, BALLOT_KEY_TYPE, sp.TUnit),
+        budget_proposal_id=sp.nat(0),
+        # Approved budgets with what was spent so far,
+        # kept apart from the proposals so those can be pruned
+        budgets=sp.big_map({}, sp.TNat, BUDGET_STATE_TYPE),
+        proposal_lifetime=sp.set_type_expr(proposal_lifetime, sp.TOption(sp.TNat)),
+        # Tokens that already have hen_address as FA2 operator
+        hen_operators=sp.big_map({}, sp.TNat, sp.TUnit),
+        # Per-owner replay protection for execute_signed
+        nonces=sp.big_map({}, sp.TAddress, sp.TNat),
+        # Used for collect/swap/cancel_swap
+        hen_address = sp.address("KT1HbQepzV1nVGg8QVznG7z4RcHseD5kwqBn"),
+        # Used for update_operators
+        hen_nft_address = sp.address("KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton"),
+        metadata = metadata
+    )
+
 class HENDao(sp.Contract):
-    def __init__(self, initOwners):
+    # proposal_lifetime - Optional number of levels after which an
+    # unpassed proposal expires and can be pruned
+    # lazy_entry_points - Store every entry point that isn't on the hot path
+    # (default, deposit, withdraw, liquidate, vote_buy) in a big_map so it is
+    # only loaded when called
+    # metadata_url - Optional TZIP-16 metadata location, see the
+    # henDao_metadata file generated at compilation for its content
+    def __init__(self, initOwners, proposal_lifetime=None, lazy_entry_points=False, metadata_url=None):
+        if lazy_entry_points:
+            self.add_flag("lazy-entry-points")
+
+        self.init_metadata("henDao_metadata", {
+            "name": "HEN DAO",
+            "description": "A DAO for shared ownership of HEN NFTs",
+            "interfaces": ["TZIP-016"],
+            "views": [self.offchain_get_owners, self.offchain_get_proposals, self.offchain_get_phase, self.offchain_get_listings]
+        })
+
         # Owners are locked at initialization in this iteration
         # Future iterations could have dynamic owners
-        self.init(
-            owners=sp.set(initOwners),
-            numOwners=sp.len(initOwners),
-            locked=False,
-            closed=False,
-            lock_votes=sp.set([], sp.TAddress),
-            close_votes=sp.set([], sp.TAddress),
-            total_contributed=sp.mutez(0),
-            total_liquidated=sp.mutez(0),
-            liquidated_ledger=sp.big_map({}, sp.TAddress, sp.TMutez),
-            equity=sp.big_map({}, sp.TAddress, sp.TMutez),
-            buy_proposals=sp.big_map({}, sp.TNat, sp.TRecord(votes=sp.TSet(sp.TAddress), passed=sp.TBool)),
-            swap_proposals=sp.big_map({}),
-            cancel_swap_proposals=sp.big_map({}, sp.TNat, sp.TRecord(votes=sp.TSet(sp.TAddress), passed=sp.TBool)),
-            swap_proposal_id=0,
-            # Used for collect/swap/cancel_swap
-            hen_address = sp.address("KT1HbQepzV1nVGg8QVznG7z4RcHseD5kwqBn"),
-            # Used for update_operators
-            hen_nft_address = sp.address("KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton")
-        )
+        self.init_type(DAO_STORAGE_TYPE)
+        self.init(**dao_storage(
+            owners=sp.big_map({owner: sp.unit for owner in initOwners}, sp.TAddress, sp.TUnit),
+            num_owners=sp.len(initOwners),
+            owner_index=sp.big_map({i: owner for i, owner in enumerate(initOwners)}, sp.TNat, sp.TAddress),
+            proposal_lifetime=sp.none if proposal_lifetime is None else sp.some(sp.nat(proposal_lifetime)),
+            metadata=sp.big_map({}, sp.TString, sp.TBytes) if metadata_url is None else sp.utils.metadata_of_url(metadata_url)
+        ))
 
     # Vote to lock the contract
     # Once everyone votes, then self.data.locked = True, deposits are disabled
@@ -46,15 +280,23 @@ class HENDao(sp.Contract):
             self.data.owners.contains(sp.sender)
         )
         
+        # Voting twice or undoing a missing vote leaves the count unchanged
+        ballot = sp.pair("lock", sp.sender)
         sp.if vote:
-            self.data.lock_votes.add(sp.sender)
+            sp.if ~self.data.phase_ballots.contains(ballot):
+                self.data.phase_ballots[ballot] = sp.unit
+                self.data.lock_votes += 1
         sp.else:
-            self.data.lock_votes.remove(sp.sender)
+            sp.if self.data.phase_ballots.contains(ballot):
+                del self.data.phase_ballots[ballot]
+                self.data.lock_votes = sp.as_nat(self.data.lock_votes - 1)
 
         # If everyone voted, then set Locked to True,
         # record the state of equity, and reset vo
-        sp.if sp.len(self.data.lock_votes) == self.data.numOwners:
+        sp.if self.data.lock_votes == self.data.numOwners:
             self.data.locked = True
+
+        sp.emit(sp.record(owner=sp.sender, vote=vote, passed=self.data.locked), tag="vote_lock")
     
     # Vote to close the contract
     # One closed, you can never use this contract for purchasing again
@@ -68,22 +310,29 @@ class HENDao(sp.Contract):
             self.data.owners.contains(sp.sender) # Must be owner
         )
 
+        ballot = sp.pair("close", sp.sender)
         sp.if vote:
-            self.data.close_votes.add(sp.sender)
+            sp.if ~self.data.phase_ballots.contains(ballot):
+                self.data.phase_ballots[ballot] = sp.unit
+                self.data.close_votes += 1
         sp.else:
-            self.data.close_votes.remove(sp.sender)
+            sp.if self.data.phase_ballots.contains(ballot):
+                del self.data.phase_ballots[ballot]
+                self.data.close_votes = sp.as_nat(self.data.close_votes - 1)
 
         # If everyone voted, then set closed to True,
-        sp.if sp.len(self.data.close_votes) == self.data.numOwners:
+        sp.if self.data.close_votes == self.data.numOwners:
             self.data.closed = True
+
+        sp.emit(sp.record(owner=sp.sender, vote=vote, passed=self.data.closed), tag="vote_close")
     
     # Default entrypoint, this will be called when money is transferred to the account 
-    @sp.entry_point
+    @sp.entry_point(lazify=False)
     def default(self):
         pass
     
     # Deposit money in the unlocked stage
-    @sp.entry_point
+    @sp.entry_point(lazify=False)
     def deposit(self):
         sp.verify(
             self.data.owners.contains(sp.sender) &
@@ -97,9 +346,11 @@ class HENDao(sp.Contract):
             self.data.equity[sp.sender] = sp.amount
         
         self.data.total_contributed += sp.amount
+
+        sp.emit(sp.record(owner=sp.sender, amount=sp.amount), tag="deposit")
     
     # Withdraw money in the unlocked stage
-    @sp.entry_point
+    @sp.entry_point(lazify=False)
     def withdraw(self, amount):
         sp.set_type(amount, sp.TMutez)
         
@@ -113,9 +364,11 @@ class HENDao(sp.Contract):
         self.data.equity[sp.sender] -= amount
         self.data.total_contributed -= amount
         sp.send(sp.sender, amount)
+
+        sp.emit(sp.record(owner=sp.sender, amount=amount), tag="withdraw")
     
     # Withdraw your money and then record that you have withdrew
-    @sp.entry_point
+    @sp.entry_point(lazify=False)
     def liquidate(self):
         sp.verify(
             self.data.owners.contains(sp.sender) &
@@ -129,65 +382,57 @@ class HENDao(sp.Contract):
         # Calculate your split of the balance based on your equity
         
         amount_to_send = sp.local("amount_to_send", sp.mutez(0))
-        amount_to_send.value = sp.split_tokens(
-            self.data.equity[sp.sender],
-            sp.utils.mutez_to_nat(real_total),
-            sp.utils.mutez_to_nat(self.data.total_contributed)
-        ) -  self.data.liquidated_ledger.get(sp.sender, sp.mutez(0))
+        amount_to_send.value = self.claimable(sp.sender, real_total)
 
         sp.verify(amount_to_send.value > sp.mutez(0))
         
-        sp.if self.data.liquidated_ledger.contains(sp.sender):
-            self.data.liquidated_ledger[sp.sender] += amount_to_send.value
-        sp.else:
-            self.data.liquidated_ledger[sp.sender] = amount_to_send.value
+        # Send to caller
+        self.pay_out(sp.sender, amount_to_send.value)
 
-        self.data.total_liquidated += amount_to_send.value
+    # Pay every owner their claimable share in one operation
+    # Owners are paid in owner_index order, starting at start and paying
+    # at most limit owners so large DAOs can be paid in several calls.
+    # Uses the same ledger as liquidate() so owners can mix both.
+    @sp.entry_point
+    def liquidate_all(self, start, limit):
+        sp.set_type(start, sp.TNat)
+        sp.set_type(limit, sp.TNat)
+
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.closed
+        )
+
+        # Computed once, the balance doesn't drop until the payouts are sent
+        # and total_liquidated grows as we go
+        real_total = sp.local("real_total", sp.balance + self.data.total_liquidated)
+
+        amount_to_send = sp.local("amount_to_send", sp.mutez(0))
+        sp.for i in sp.range(start, sp.min(start + limit, self.data.numOwners)):
+            owner = self.data.owner_index[i]
+
+            # Owners that never deposited have nothing to claim
+            sp.if self.data.equity.get(owner, sp.mutez(0)) > sp.mutez(0):
+                amount_to_send.value = self.claimable(owner, real_total.value)
+
+                sp.if amount_to_send.value > sp.mutez(0):
+                    self.pay_out(owner, amount_to_send.value)
 
-        # Send to caller
-        sp.send(sp.sender, amount_to_send.value)
-    
     # Vote for a specific "swap" on HEN
     # A swap is an objkt that is being sold at a specific price
-    @sp.entry_point
+    @sp.entry_point(lazify=False)
     def vote_buy(self, swap_id, price):
         sp.set_type(swap_id, sp.TNat)
         sp.set_type(price, sp.TMutez)
-        
-        sp.verify(
-            self.data.owners.contains(sp.sender) &
-            self.data.locked &
-            ~self.data.closed
-        )
-
-        sp.if self.data.buy_proposals.contains(swap_id):
-            # If already passed, then fail
-            sp.verify(~self.data.buy_proposals[swap_id].passed)
-            
-            self.data.buy_proposals[swap_id].votes.add(sp.sender)
-        sp.else:
-            votes = sp.set()
-            votes.add(sp.sender)
-            self.data.buy_proposals[swap_id] = sp.record(votes=votes, passed=False)
 
-        # Everyone voted yes, execute the buy
-        sp.if sp.len(self.data.buy_proposals[swap_id].votes) == sp.len(self.data.owners):
-            self.hen_collect(swap_id, price)
-            self.data.buy_proposals[swap_id].passed = True
+        self.cast_vote_buy(swap_id, price)
 
     # Undo a vote for a swap
     @sp.entry_point
     def undo_vote_buy(self, swap_id):
         sp.set_type(swap_id, sp.TNat)
-        
-        sp.verify(
-            self.data.owners.contains(sp.sender) &
-            self.data.locked &
-            ~self.data.closed &
-            ~self.data.buy_proposals[swap_id].passed
-        )
 
-        self.data.buy_proposals[swap_id].votes.remove(sp.sender)
+        self.cast_undo_vote_buy(swap_id)
 
     # Propose selling an objkt at a certain price point
     @sp.entry_point
@@ -202,7 +447,25 @@ class HENDao(sp.Contract):
             self.data.locked
         )
 
-        self.data.swap_proposals[self.data.swap_proposal_id] = sp.record(objkt_amount=objkt_amount, objkt_id=objkt_id, xtz_per_objkt=xtz_per_objkt, votes=sp.set([], sp.TAddress), passed=False, creator=creator)
+        swap = sp.record(objkt_amount=objkt_amount, objkt_id=objkt_id, xtz_per_objkt=xtz_per_objkt, creator=creator)
+        self.data.swap_proposals[self.data.swap_proposal_id] = sp.record(swaps=sp.list([swap]), num_votes=0, passed=False, created=sp.level)
+
+        # Increment the proposal ID
+        self.data.swap_proposal_id += 1
+
+    # Propose selling several objkts at once
+    # When it passes, one update_operators call covers every token before the HEN swaps
+    @sp.entry_point
+    def propose_swaps(self, swaps):
+        sp.set_type(swaps, sp.TList(SWAP_TYPE))
+
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            (sp.len(swaps) > 0)
+        )
+
+        self.data.swap_proposals[self.data.swap_proposal_id] = sp.record(swaps=swaps, num_votes=0, passed=False, created=sp.level)
 
         # Increment the proposal ID
         self.data.swap_proposal_id += 1
@@ -212,206 +475,1027 @@ class HENDao(sp.Contract):
     @sp.entry_point
     def vote_swap(self, swap_proposal_id):
         sp.set_type(swap_proposal_id, sp.TNat)
-        
-        sp.verify(
-            self.data.owners.contains(sp.sender) &
-            self.data.locked &
-            self.data.swap_proposals.contains(swap_proposal_id) &
-            ~self.data.swap_proposals[swap_proposal_id].passed
-        )
 
-        self.data.swap_proposals[swap_proposal_id].votes.add(sp.sender)
-        
-        sp.if sp.len(self.data.swap_proposals[swap_proposal_id].votes) == self.data.numOwners:
-            self.hen_swap(swap_proposal_id)
-            self.data.swap_proposals[swap_proposal_id].passed = True
+        self.cast_vote_swap(swap_proposal_id)
     
     # Undo a vote for a proposal
     @sp.entry_point
     def undo_vote_swap(self, swap_proposal_id):
         sp.set_type(swap_proposal_id, sp.TNat)
 
+        self.cast_undo_vote_swap(swap_proposal_id)
+
+    # Vote to cancel an existing swap
+    # This will call HEN's cancel() if everyone votes
+    # swap_id - The swap to cancel, must be a valid swap_id that the contract owns
+    @sp.entry_point
+    def vote_cancel_swap(self, swap_id):
+        sp.set_type(swap_id, sp.TNat)
+
+        self.cast_vote_cancel_swap(swap_id)
+    
+    # Undo your vote to cancel an existing swap
+    @sp.entry_point
+    def undo_vote_cancel_swap(self, swap_id):
+        sp.set_type(swap_id, sp.TNat)
+
+        self.cast_undo_vote_cancel_swap(swap_id)
+
+    # Propose buying several swaps in a single voting round
+    # cap is the most the whole sweep may cost. It is only checked here,
+    # the items can't change after the proposal is made
+    @sp.entry_point
+    def propose_sweep(self, items, cap):
+        sp.set_type(items, sp.TList(SWEEP_ITEM_TYPE))
+        sp.set_type(cap, sp.TMutez)
+
         sp.verify(
             self.data.owners.contains(sp.sender) &
             self.data.locked &
-            self.data.swap_proposals.contains(swap_proposal_id) &
-            ~self.data.swap_proposals[swap_proposal_id].passed
+            ~self.data.closed &
+            (sp.len(items) > 0) &
+            (self.sweep_total(items) <= cap)
         )
 
-        self.data.swap_proposals[swap_proposal_id].votes.remove(sp.sender)
+        self.data.sweep_proposals[self.data.sweep_proposal_id] = sp.record(
+            items=items,
+            cap=cap,
+            num_votes=0,
+            passed=False,
+            created=sp.level
+        )
 
-    # Vote to cancel an existing swap
-    # This will call HEN's cancel() if everyone votes
-    # swap_id - The swap to cancel, must be a valid swap_id that the contract owns
+        # Increment the proposal ID
+        self.data.sweep_proposal_id += 1
+
+    # Vote for a sweep proposal
+    # This will call HEN's collect() for every item if everyone votes
     @sp.entry_point
-    def vote_cancel_swap(self, swap_id):
+    def vote_sweep(self, sweep_id):
+        sp.set_type(sweep_id, sp.TNat)
+
+        self.cast_vote_sweep(sweep_id)
+
+    # Undo a vote for a sweep proposal
+    @sp.entry_point
+    def undo_vote_sweep(self, sweep_id):
+        sp.set_type(sweep_id, sp.TNat)
+
+        self.cast_undo_vote_sweep(sweep_id)
+
+    # Propose a standing budget for buys, see BUDGET_TYPE
+    # Approving it takes every owner's vote like any other proposal
+    @sp.entry_point
+    def propose_budget(self, max_price, spend_cap, min_swap_id, expiry):
+        sp.set_type(max_price, sp.TMutez)
+        sp.set_type(spend_cap, sp.TMutez)
+        sp.set_type(min_swap_id, sp.TNat)
+        sp.set_type(expiry, sp.TNat)
+
         sp.verify(
             self.data.owners.contains(sp.sender) &
             self.data.locked &
-            self.data.cancel_swap_proposals.contains(swap_id) &
-            ~self.data.cancel_swap_proposals[swap_id].passed
+            ~self.data.closed &
+            (expiry > sp.level)
         )
 
-        # Add to set of votes if it exists
-        # Otherwise, create the set and initialize
-        sp.if self.data.cancel_swap_proposals.contains(swap_id):
-            self.data.cancel_swap_proposals[swap_id].votes.add(sp.sender)
-        sp.else:
-            self.data.cancel_swap_proposals[swap_id] = sp.record(votes=sp.set([sp.sender]), passed=False)
+        policy = sp.record(max_price=max_price, spend_cap=spend_cap, min_swap_id=min_swap_id, expiry=expiry)
+        self.data.budget_proposals[self.data.budget_proposal_id] = sp.record(policy=policy, num_votes=0, passed=False, created=sp.level)
 
-        sp.if sp.len(self.data.cancel_swap_proposals[swap_id].votes) == self.data.numOwners:
-            self.hen_cancel_swap(swap_id)
-    
-    # Undo your vote to cancel an existing swap
+        # Increment the proposal ID
+        self.data.budget_proposal_id += 1
+
+    # Vote for a budget proposal, it becomes usable once everyone votes
     @sp.entry_point
-    def undo_vote_cancel_swap(self, swap_id):
+    def vote_budget(self, budget_id):
+        sp.set_type(budget_id, sp.TNat)
+
+        self.cast_vote_budget(budget_id)
+
+    # Undo a vote for a budget proposal
+    @sp.entry_point
+    def undo_vote_budget(self, budget_id):
+        sp.set_type(budget_id, sp.TNat)
+
+        self.cast_undo_vote_budget(budget_id)
+
+    # Buy a swap right away within an approved budget, any owner can call it
+    # HEN's collect only takes the swap_id, so a creator can't be checked on-chain.
+    # The budget bounds what one owner can spend instead, see BUDGET_TYPE
+    @sp.entry_point
+    def collect_within_budget(self, budget_id, swap_id, price):
+        sp.set_type(budget_id, sp.TNat)
+        sp.set_type(swap_id, sp.TNat)
+        sp.set_type(price, sp.TMutez)
+
         sp.verify(
             self.data.owners.contains(sp.sender) &
             self.data.locked &
-            self.data.cancel_swap_proposals.contains(swap_id) &
-            ~self.data.cancel_swap_proposals[swap_id].passed
+            ~self.data.closed &
+            self.data.budgets.contains(budget_id)
         )
 
-        self.data.cancel_swap_proposals[swap_id].votes.remove(sp.sender)
+        budget = self.data.budgets[budget_id]
+        sp.verify(
+            (sp.level <= budget.policy.expiry) &
+            (price <= budget.policy.max_price) &
+            (swap_id >= budget.policy.min_swap_id) &
+            (budget.spent + price <= budget.policy.spend_cap)
+        )
 
-    ### HEN Contract Functions ###    
-    def hen_collect(self, swap_id, price):
-        c = sp.contract(sp.TNat, self.data.hen_address, entry_point = "collect").open_some()
-        sp.transfer(swap_id, price, c)
+        budget.spent += price
+        self.hen_collect(sp.record(swap_id=swap_id, price=price))
 
-    def hen_swap(self, swap_proposal_id):
-        # Check that the swap exists
-        sp.if ~self.data.swap_proposals.contains(swap_proposal_id):
-            sp.failwith("swap doesn't exist")
+        sp.emit(sp.record(
+            budget_id=budget_id,
+            swap_id=swap_id,
+            buyer=sp.sender,
+            spent=budget.spent
+        ), tag="collect_within_budget")
 
-        # Get swap info
-        swap_info = self.data.swap_proposals[swap_proposal_id]
+    # End a budget before its expiry
+    # Any owner can do this since it only takes permissions away
+    @sp.entry_point
+    def revoke_budget(self, budget_id):
+        sp.set_type(budget_id, sp.TNat)
 
-        # First, you need to update operators
-        # Example https://tzkt.io/opGfD9TeKG145Rn427t32KVU3fPs74VucUxNLYGxZ7iN5yrPeJ8/11567483
-        t = sp.TRecord(owner=sp.TAddress, operator=sp.TAddress, token_id=sp.TNat)
-        t = t.layout(("owner", ("operator", "token_id")))
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.budgets.contains(budget_id)
+        )
 
-        nft_contract = sp.contract(sp.TList(
-            sp.TVariant(
-              add_operator=t,
-              remove_operator=t
-            )
-        ),
-        self.data.hen_nft_address,
-        entry_point="update_operators").open_some()
-
-        sp.transfer(
-            sp.list([sp.variant("add_operator", sp.record(
-                owner=sp.self_address,
-                operator=self.data.hen_address,
-                token_id=swap_info.objkt_id
-            ))]),
-            sp.mutez(0),
-            nft_contract
+        del self.data.budgets[budget_id]
+
+        sp.emit(budget_id, tag="revoke_budget")
+
+    # Record the HEN swap_id of a listing
+    # HEN's swap doesn't return the new swap_id, but it shows up in the big_map
+    # diff of the operation that listed it, so any owner can register it.
+    # Registering again replaces the swap_id, so a wrong one can be corrected
+    @sp.entry_point
+    def register_listing(self, objkt_id, swap_id):
+        sp.set_type(objkt_id, sp.TNat)
+        sp.set_type(swap_id, sp.TNat)
+
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.listings.contains(objkt_id) &
+            ~self.data.listing_swap_ids.contains(swap_id)
         )
 
-        # Call into HEN contract
-        c = sp.contract(
-            sp.TRecord(
-                creator=sp.TAddress,
-                objkt_amount=sp.TNat,
-                objkt_id=sp.TNat,
-                royalties=sp.TNat,
-                xtz_per_objkt=sp.TMutez
-            ), 
-            self.data.hen_address, entry_point = "swap").open_some()
-        sp.transfer(
-            sp.record(
-                creator=swap_info.creator,
-                objkt_amount=swap_info.objkt_amount,
-                objkt_id=swap_info.objkt_id,
-                royalties=100,
-                xtz_per_objkt=swap_info.xtz_per_objkt
-            ),
-            sp.mutez(0), c)
+        sp.if self.data.listings[objkt_id].swap_id.is_some():
+            del self.data.listing_swap_ids[self.data.listings[objkt_id].swap_id.open_some()]
 
-    def hen_cancel_swap(self, swap_id):
-        c = sp.contract(sp.TNat, self.data.hen_address, entry_point = "cancel_swap").open_some()
-        sp.transfer(swap_id, sp.mutez(0), c)
+        self.data.listings[objkt_id].swap_id = sp.some(swap_id)
+        self.data.listing_swap_ids[swap_id] = objkt_id
 
-if "templates" not in __name__:
-    @sp.add_test(name = "test_full_flow")
-    def test():
-        c1 = HENDao([sp.address("tz1owner1"), sp.address("tz1owner2")])
-        stub = HENStubTester()
-        stub.set_initial_balance(sp.mutez(10000))
-        
-        scenario = sp.test_scenario()
-        scenario.h1("Full flow test")
-        scenario += c1
-        scenario += stub
-    
-        user1 = sp.address("tz1owner1")
-        user2 = sp.address("tz1owner2")
-        hacker = sp.address("tz1hacker")
+        sp.emit(sp.record(objkt_id=objkt_id, swap_id=swap_id), tag="register_listing")
 
-        c1.deposit().run(sender=user1, amount= sp.mutez(10))
-        scenario.verify(c1.data.equity[user1] == sp.mutez(10))
-        c1.deposit().run(sender=user1, amount= sp.mutez(5))
-        scenario.verify(c1.data.equity[user1] == sp.mutez(15))
-        scenario.verify(c1.data.total_contributed == sp.mutez(15))
-        
-        # Test withdraw
-        c1.withdraw(sp.mutez(5)).run(sender=user1)
-        scenario.verify(c1.data.equity[user1] == sp.mutez(10))
-        scenario.verify(c1.data.total_contributed == sp.mutez(10))
-        c1.deposit().run(sender=user1, amount= sp.mutez(5))
+    # Vote to drop a sold out listing from the index
+    # The contract can't see sales, so every owner has to agree the listing is gone.
+    # Like vote_cancel_listing, this votes on the registered swap_id's proposal
+    @sp.entry_point
+    def vote_clear_listing(self, objkt_id):
+        sp.set_type(objkt_id, sp.TNat)
 
-        
-        # Hacker should not be able to deposit
-        c1.deposit().run(valid=False, sender=hacker, amount=sp.mutez(10))
-        
-        # Second user deposits
-        c1.deposit().run(sender=user2, amount=sp.mutez(45))
-        scenario.verify(c1.data.equity[user2] == sp.mutez(45))
-        scenario.verify(c1.data.total_contributed == sp.mutez(60))
-        
-        # First user can't withdraw more than they put in
-        c1.withdraw(sp.mutez(50)).run(valid=False)
-        
-        # Fund is locked
-        c1.vote_lock(True).run(sender=user1)
-        c1.vote_lock(True).run(sender=user2)
-        
-        # Deposits should be disabled
-        c1.deposit().run(sender=user1, amount= sp.mutez(10), valid=False)
-        c1.deposit().run(sender=user2, amount= sp.mutez(10), valid=False)
-        
-        # NFT is sold
-        scenario.h1("NFT is sold")
-        stub.simulate_purchase(dest=c1.address, amount=sp.mutez(100)).run(sender=user1)
-        scenario.verify(c1.balance == sp.mutez(160))
-        
-        # Fund is closed
-        c1.vote_close(True).run(sender=user1)
-        c1.vote_close(True).run(sender=user2)
-        
-        # user1 has equity 15/60 = 25%
-        # user2 has equity 45/60 = 75%;
-        # Total balance after sale is 160
-        # user1 owns 0.25 * 160 = 40
-        # user2 owns 0.75 * 160 = 120
+        self.cast_vote_clear_listing(self.listing_swap_id(objkt_id))
 
-        # user1 withdraws
-        c1.liquidate().run(sender=user1)
-        scenario.verify(c1.balance == sp.mutez(120))
-        
-        # Can't liquidate again if you have no funds left
-        c1.liquidate().run(sender=user1, valid=False)
+    # Undo a vote to clear a listing, by the swap_id that was voted on
+    @sp.entry_point
+    def undo_vote_clear_listing(self, swap_id):
+        sp.set_type(swap_id, sp.TNat)
 
-        # user2 withdraws
-        c1.liquidate().run(sender=user2)
-        scenario.verify(c1.balance == sp.mutez(0))
-        
-        # New sale is made
-        stub.simulate_purchase(dest=c1.address, amount=sp.mutez(100)).run(sender=user1)
-        scenario.verify(c1.balance == sp.mutez(100))
+        self.cast_undo_vote_clear_listing(swap_id)
+
+    # Vote to cancel the DAO's listing of an objkt, same as vote_cancel_swap
+    # with the listing's registered swap_id
+    @sp.entry_point
+    def vote_cancel_listing(self, objkt_id):
+        sp.set_type(objkt_id, sp.TNat)
+
+        self.cast_vote_cancel_swap(self.listing_swap_id(objkt_id))
+
+    # Propose listing an objkt again at a new price
+    # This is a swap proposal voted on with vote_swap, when it passes
+    # the listing's swap_id at that time is cancelled before the new one is made,
+    # so registering a corrected swap_id in between is fine.
+    # objkt_amount is what is left of the listing, the contract can't see sales
+    @sp.entry_point
+    def propose_reprice(self, objkt_id, objkt_amount, xtz_per_objkt):
+        sp.set_type(objkt_id, sp.TNat)
+        sp.set_type(objkt_amount, sp.TNat)
+        sp.set_type(xtz_per_objkt, sp.TMutez)
+
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked
+        )
+
+        # Only to check the listing is registered, the swap to cancel is
+        # looked up again when the reprice passes
+        self.listing_swap_id(objkt_id)
+        listing = self.data.listings[objkt_id]
+        swap = sp.record(
+            objkt_amount=objkt_amount,
+            objkt_id=objkt_id,
+            xtz_per_objkt=xtz_per_objkt,
+            creator=listing.swap.creator
+        )
+        self.data.swap_proposals[self.data.swap_proposal_id] = sp.record(swaps=sp.list([swap]), num_votes=0, passed=False, created=sp.level)
+        self.data.reprices[self.data.swap_proposal_id] = objkt_id
+
+        # Increment the proposal ID
+        self.data.swap_proposal_id += 1
+
+    # Apply several votes and undos in one operation
+    # Votes are applied in order with the same checks as the single vote entrypoints,
+    # any failing vote reverts the whole batch
+    @sp.entry_point
+    def vote_batch(self, votes):
+        sp.set_type(votes, sp.TList(sp.TVariant(
+            vote_buy=sp.TRecord(swap_id=sp.TNat, price=sp.TMutez),
+            undo_vote_buy=sp.TNat,
+            vote_swap=sp.TNat,
+            undo_vote_swap=sp.TNat,
+            vote_cancel_swap=sp.TNat,
+            undo_vote_cancel_swap=sp.TNat,
+            vote_budget=sp.TNat,
+            undo_vote_budget=sp.TNat,
+            vote_sweep=sp.TNat,
+            undo_vote_sweep=sp.TNat
+        )))
+
+        sp.for vote in votes:
+            with vote.match_cases() as arg:
+                with arg.match("vote_buy") as buy:
+                    self.cast_vote_buy(buy.swap_id, buy.price)
+                with arg.match("undo_vote_buy") as swap_id:
+                    self.cast_undo_vote_buy(swap_id)
+                with arg.match("vote_swap") as swap_proposal_id:
+                    self.cast_vote_swap(swap_proposal_id)
+                with arg.match("undo_vote_swap") as swap_proposal_id:
+                    self.cast_undo_vote_swap(swap_proposal_id)
+                with arg.match("vote_cancel_swap") as swap_id:
+                    self.cast_vote_cancel_swap(swap_id)
+                with arg.match("undo_vote_cancel_swap") as swap_id:
+                    self.cast_undo_vote_cancel_swap(swap_id)
+                with arg.match("vote_budget") as budget_id:
+                    self.cast_vote_budget(budget_id)
+                with arg.match("undo_vote_budget") as budget_id:
+                    self.cast_undo_vote_budget(budget_id)
+                with arg.match("vote_sweep") as sweep_id:
+                    self.cast_vote_sweep(sweep_id)
+                with arg.match("undo_vote_sweep") as sweep_id:
+                    self.cast_undo_vote_sweep(sweep_id)
+
+    # Execute a buy, swap or cancel_swap that every owner signed off-chain
+    # Anyone can relay the signatures, so the action runs in one operation.
+    # Each owner signs pack(record(contract, action, nonce)) with their current nonce
+    @sp.entry_point
+    def execute_signed(self, action, signatures):
+        sp.set_type(action, sp.TVariant(
+            buy=sp.TRecord(swap_id=sp.TNat, price=sp.TMutez),
+            swap=sp.TNat,
+            cancel_swap=sp.TNat
+        ))
+        sp.set_type(signatures, sp.TList(sp.TRecord(public_key=sp.TKey, signature=sp.TSignature)))
+
+        sp.verify(self.data.locked)
+
+        # Every owner must sign exactly once
+        signers = sp.local("signers", sp.set([], sp.TAddress))
+        sp.for signed in signatures:
+            signer = sp.to_address(sp.implicit_account(sp.hash_key(signed.public_key)))
+            sp.verify(
+                self.data.owners.contains(signer) &
+                ~signers.value.contains(signer)
+            )
+
+            nonce = self.data.nonces.get(signer, 0)
+            message = sp.pack(sp.record(contract=sp.self_address, action=action, nonce=nonce))
+            sp.verify(sp.check_signature(signed.public_key, signed.signature, message))
+
+            self.data.nonces[signer] = nonce + 1
+            signers.value.add(signer)
+
+        sp.verify(sp.len(signers.value) == self.data.numOwners)
+
+        with action.match_cases() as arg:
+            with arg.match("buy") as buy:
+                sp.verify(~self.data.closed)
+                self.mark_passed(self.data.buy_proposals, buy.swap_id)
+                self.hen_collect(sp.record(swap_id=buy.swap_id, price=buy.price))
+            with arg.match("swap") as swap_proposal_id:
+                sp.verify(
+                    self.data.swap_proposals.contains(swap_proposal_id) &
+                    ~self.data.swap_proposals[swap_proposal_id].passed
+                )
+                self.verify_not_expired(self.data.swap_proposals[swap_proposal_id])
+                self.hen_swap(swap_proposal_id)
+                self.data.swap_proposals[swap_proposal_id].passed = True
+            with arg.match("cancel_swap") as swap_id:
+                self.mark_passed(self.data.cancel_swap_proposals, swap_id)
+                self.hen_cancel_swap(swap_id)
+
+    # Remove the HEN marketplace as operator for tokens the DAO no longer lists
+    # HEN escrows tokens when a swap is made, so this never affects live listings
+    # and any owner can call it since it only removes permissions
+    @sp.entry_point
+    def revoke_operators(self, token_ids):
+        sp.set_type(token_ids, sp.TList(sp.TNat))
+
+        sp.verify(self.data.owners.contains(sp.sender))
+
+        operators = sp.local("operators", sp.list([], OPERATOR_UPDATE_TYPE))
+        sp.for token_id in token_ids:
+            sp.if self.data.hen_operators.contains(token_id):
+                del self.data.hen_operators[token_id]
+                operators.value.push(sp.variant("remove_operator", sp.record(
+                    owner=sp.self_address,
+                    operator=self.data.hen_address,
+                    token_id=token_id
+                )))
+
+        sp.if sp.len(operators.value) > 0:
+            sp.transfer(operators.value, sp.mutez(0), self.nft_operators_contract())
+
+    # Delete passed or expired proposals and their ballots to free storage
+    # Each item lists the proposal and every owner that has a ballot on it,
+    # large backlogs can be pruned over several calls
+    @sp.entry_point
+    def prune_proposals(self, proposals):
+        sp.set_type(proposals, sp.TList(sp.TRecord(
+            proposal=PROPOSAL_REF_TYPE,
+            voters=sp.TList(sp.TAddress)
+        )))
+
+        sp.verify(self.data.owners.contains(sp.sender))
+
+        sp.for item in proposals:
+            with item.proposal.match_cases() as arg:
+                with arg.match("buy") as swap_id:
+                    self.prune(self.data.buy_proposals, self.data.buy_ballots, swap_id, item.voters)
+                with arg.match("swap") as swap_proposal_id:
+                    self.prune(self.data.swap_proposals, self.data.swap_ballots, swap_proposal_id, item.voters)
+                    # A reprice that expired unpassed still has its entry
+                    del self.data.reprices[swap_proposal_id]
+                with arg.match("cancel_swap") as swap_id:
+                    self.prune(self.data.cancel_swap_proposals, self.data.cancel_swap_ballots, swap_id, item.voters)
+                with arg.match("clear_listing") as swap_id:
+                    self.prune(self.data.clear_listing_proposals, self.data.clear_listing_ballots, swap_id, item.voters)
+                with arg.match("budget") as budget_id:
+                    self.prune(self.data.budget_proposals, self.data.budget_ballots, budget_id, item.voters)
+                with arg.match("sweep") as sweep_id:
+                    self.prune(self.data.sweep_proposals, self.data.sweep_ballots, sweep_id, item.voters)
+
+    ### Views ###
+    # Available on-chain for other contracts and as TZIP-16 off-chain views
+
+    # What liquidate() would pay each owner right now, with their equity
+    # Divide equity by total_contributed for the equity share
+    @sp.onchain_view()
+    def get_owners(self, owners):
+        self.owners_view(owners)
+
+    @sp.offchain_view(pure=False, name="get_owners")
+    def offchain_get_owners(self, owners):
+        self.owners_view(owners)
+
+    # Tally of each proposal, in the order they were asked for
+    # Proposals that don't exist are returned as none
+    @sp.onchain_view()
+    def get_proposals(self, proposals):
+        self.proposals_view(proposals)
+
+    @sp.offchain_view(pure=True, name="get_proposals")
+    def offchain_get_proposals(self, proposals):
+        self.proposals_view(proposals)
+
+    # The DAO's listing of each objkt_id, or none if it isn't listed
+    @sp.onchain_view()
+    def get_listings(self, objkt_ids):
+        self.listings_view(objkt_ids)
+
+    @sp.offchain_view(pure=True, name="get_listings")
+    def offchain_get_listings(self, objkt_ids):
+        self.listings_view(objkt_ids)
+
+    # Current lock/close phase and vote counts
+    @sp.onchain_view()
+    def get_phase(self):
+        self.phase_view()
+
+    @sp.offchain_view(pure=True, name="get_phase")
+    def offchain_get_phase(self):
+        self.phase_view()
+
+    def owners_view(self, owners):
+        sp.set_type(owners, sp.TList(sp.TAddress))
+
+        real_total = sp.local("real_total", sp.balance + self.data.total_liquidated)
+        claimable = sp.local("claimable", sp.mutez(0))
+        result = sp.local("result", sp.map({}, sp.TAddress, sp.TRecord(
+            claimable=sp.TMutez,
+            equity=sp.TMutez,
+            liquidated=sp.TMutez
+        )))
+
+        sp.for owner in owners:
+            # Same as liquidate(), but reports 0 where liquidate would fail
+            claimable.value = sp.mutez(0)
+            sp.if self.data.closed & (self.data.equity.get(owner, sp.mutez(0)) > sp.mutez(0)):
+                sp.if self.claimable_share(owner, real_total.value) > self.data.liquidated_ledger.get(owner, sp.mutez(0)):
+                    claimable.value = self.claimable(owner, real_total.value)
+
+            result.value[owner] = sp.record(
+                claimable=claimable.value,
+                equity=self.data.equity.get(owner, sp.mutez(0)),
+                liquidated=self.data.liquidated_ledger.get(owner, sp.mutez(0))
+            )
+
+        sp.result(sp.record(total_contributed=self.data.total_contributed, owners=result.value))
+
+    def proposals_view(self, proposals):
+        sp.set_type(proposals, sp.TList(PROPOSAL_REF_TYPE))
+
+        result = sp.local("result", sp.list([], sp.TOption(sp.TRecord(
+            num_votes=sp.TNat,
+            passed=sp.TBool,
+            created=sp.TNat
+        ))))
+
+        sp.for proposal in proposals:
+            with proposal.match_cases() as arg:
+                with arg.match("buy") as swap_id:
+                    self.push_proposal_status(result, self.data.buy_proposals, swap_id)
+                with arg.match("swap") as swap_proposal_id:
+                    self.push_proposal_status(result, self.data.swap_proposals, swap_proposal_id)
+                with arg.match("cancel_swap") as swap_id:
+                    self.push_proposal_status(result, self.data.cancel_swap_proposals, swap_id)
+                with arg.match("clear_listing") as swap_id:
+                    self.push_proposal_status(result, self.data.clear_listing_proposals, swap_id)
+                with arg.match("budget") as budget_id:
+                    self.push_proposal_status(result, self.data.budget_proposals, budget_id)
+                with arg.match("sweep") as sweep_id:
+                    self.push_proposal_status(result, self.data.sweep_proposals, sweep_id)
+
+        sp.result(result.value.rev())
+
+    def push_proposal_status(self, result, proposals, proposal_id):
+        sp.if proposals.contains(proposal_id):
+            result.value.push(sp.some(sp.record(
+                num_votes=proposals[proposal_id].num_votes,
+                passed=proposals[proposal_id].passed,
+                created=proposals[proposal_id].created
+            )))
+        sp.else:
+            result.value.push(sp.none)
+
+    def listings_view(self, objkt_ids):
+        sp.set_type(objkt_ids, sp.TList(sp.TNat))
+
+        result = sp.local("result", sp.map({}, sp.TNat, sp.TOption(LISTING_TYPE)))
+        sp.for objkt_id in objkt_ids:
+            result.value[objkt_id] = self.data.listings.get_opt(objkt_id)
+
+        sp.result(result.value)
+
+    def phase_view(self):
+        sp.result(sp.record(
+            locked=self.data.locked,
+            closed=self.data.closed,
+            lock_votes=self.data.lock_votes,
+            close_votes=self.data.close_votes,
+            num_owners=self.data.numOwners,
+            proposal_lifetime=self.data.proposal_lifetime
+        ))
+
+    ### Voting Helpers ###
+    # Shared by the single vote entrypoints and vote_batch
+    # They are inlined in both, so they only hold the guards and call the
+    # tally and HEN lambdas for the rest
+    def cast_vote_buy(self, swap_id, price):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            ~self.data.closed
+        )
+
+        sp.if self.data.buy_proposals.contains(swap_id):
+            # If already passed, then fail
+            sp.verify(~self.data.buy_proposals[swap_id].passed)
+        sp.else:
+            self.data.buy_proposals[swap_id] = sp.record(num_votes=0, passed=False, created=sp.level)
+
+        self.tally(sp.record(proposal=sp.variant("buy", swap_id), vote=True))
+
+        # Everyone voted yes, execute the buy
+        sp.if self.data.buy_proposals[swap_id].num_votes == self.data.numOwners:
+            self.hen_collect(sp.record(swap_id=swap_id, price=price))
+            self.data.buy_proposals[swap_id].passed = True
+
+    def cast_undo_vote_buy(self, swap_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            ~self.data.closed &
+            ~self.data.buy_proposals[swap_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("buy", swap_id), vote=False))
+
+    def cast_vote_swap(self, swap_proposal_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            self.data.swap_proposals.contains(swap_proposal_id) &
+            ~self.data.swap_proposals[swap_proposal_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("swap", swap_proposal_id), vote=True))
+        
+        sp.if self.data.swap_proposals[swap_proposal_id].num_votes == self.data.numOwners:
+            self.hen_swap(swap_proposal_id)
+            self.data.swap_proposals[swap_proposal_id].passed = True
+
+    def cast_undo_vote_swap(self, swap_proposal_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            self.data.swap_proposals.contains(swap_proposal_id) &
+            ~self.data.swap_proposals[swap_proposal_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("swap", swap_proposal_id), vote=False))
+
+    def cast_vote_cancel_swap(self, swap_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked
+        )
+
+        # Vote on the proposal if it exists
+        # Otherwise, initialize it with an empty tally
+        sp.if self.data.cancel_swap_proposals.contains(swap_id):
+            sp.verify(~self.data.cancel_swap_proposals[swap_id].passed)
+        sp.else:
+            self.data.cancel_swap_proposals[swap_id] = sp.record(num_votes=0, passed=False, created=sp.level)
+
+        self.tally(sp.record(proposal=sp.variant("cancel_swap", swap_id), vote=True))
+
+        sp.if self.data.cancel_swap_proposals[swap_id].num_votes == self.data.numOwners:
+            self.hen_cancel_swap(swap_id)
+            self.data.cancel_swap_proposals[swap_id].passed = True
+
+    def cast_undo_vote_cancel_swap(self, swap_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            self.data.cancel_swap_proposals.contains(swap_id) &
+            ~self.data.cancel_swap_proposals[swap_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("cancel_swap", swap_id), vote=False))
+
+    def cast_vote_clear_listing(self, swap_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked
+        )
+
+        sp.if self.data.clear_listing_proposals.contains(swap_id):
+            sp.verify(~self.data.clear_listing_proposals[swap_id].passed)
+        sp.else:
+            self.data.clear_listing_proposals[swap_id] = sp.record(num_votes=0, passed=False, created=sp.level)
+
+        self.tally(sp.record(proposal=sp.variant("clear_listing", swap_id), vote=True))
+
+        # The listing may have been cancelled or replaced since
+        sp.if self.data.clear_listing_proposals[swap_id].num_votes == self.data.numOwners:
+            sp.if self.data.listing_swap_ids.contains(swap_id):
+                self.remove_listing(self.data.listing_swap_ids[swap_id])
+            self.data.clear_listing_proposals[swap_id].passed = True
+
+    def cast_undo_vote_clear_listing(self, swap_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            self.data.clear_listing_proposals.contains(swap_id) &
+            ~self.data.clear_listing_proposals[swap_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("clear_listing", swap_id), vote=False))
+
+    def cast_vote_sweep(self, sweep_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            ~self.data.closed &
+            self.data.sweep_proposals.contains(sweep_id) &
+            ~self.data.sweep_proposals[sweep_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("sweep", sweep_id), vote=True))
+
+        sp.if self.data.sweep_proposals[sweep_id].num_votes == self.data.numOwners:
+            self.hen_sweep(sweep_id)
+            self.data.sweep_proposals[sweep_id].passed = True
+
+    def cast_undo_vote_sweep(self, sweep_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            ~self.data.closed &
+            self.data.sweep_proposals.contains(sweep_id) &
+            ~self.data.sweep_proposals[sweep_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("sweep", sweep_id), vote=False))
+
+    def cast_vote_budget(self, budget_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            ~self.data.closed &
+            self.data.budget_proposals.contains(budget_id) &
+            ~self.data.budget_proposals[budget_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("budget", budget_id), vote=True))
+
+        sp.if self.data.budget_proposals[budget_id].num_votes == self.data.numOwners:
+            self.data.budgets[budget_id] = sp.record(policy=self.data.budget_proposals[budget_id].policy, spent=sp.mutez(0))
+            self.data.budget_proposals[budget_id].passed = True
+
+    def cast_undo_vote_budget(self, budget_id):
+        sp.verify(
+            self.data.owners.contains(sp.sender) &
+            self.data.locked &
+            ~self.data.closed &
+            self.data.budget_proposals.contains(budget_id) &
+            ~self.data.budget_proposals[budget_id].passed
+        )
+
+        self.tally(sp.record(proposal=sp.variant("budget", budget_id), vote=False))
+
+    # Add or remove the sender's vote on a proposal of any kind
+    # A lambda so its body is compiled once, not into every entrypoint that votes
+    @sp.private_lambda(with_storage="read-write", with_operations=True, wrap_call=True)
+    def tally(self, params):
+        sp.set_type(params, sp.TRecord(proposal=PROPOSAL_REF_TYPE, vote=sp.TBool))
+
+        with params.proposal.match_cases() as arg:
+            with arg.match("buy") as swap_id:
+                self.count_vote(self.data.buy_proposals, self.data.buy_ballots, swap_id, params.vote, "vote_buy", "undo_vote_buy")
+            with arg.match("swap") as swap_proposal_id:
+                self.count_vote(self.data.swap_proposals, self.data.swap_ballots, swap_proposal_id, params.vote, "vote_swap", "undo_vote_swap")
+            with arg.match("cancel_swap") as swap_id:
+                self.count_vote(self.data.cancel_swap_proposals, self.data.cancel_swap_ballots, swap_id, params.vote, "vote_cancel_swap", "undo_vote_cancel_swap")
+            with arg.match("clear_listing") as swap_id:
+                self.count_vote(self.data.clear_listing_proposals, self.data.clear_listing_ballots, swap_id, params.vote, "vote_clear_listing", "undo_vote_clear_listing")
+            with arg.match("budget") as budget_id:
+                self.count_vote(self.data.budget_proposals, self.data.budget_ballots, budget_id, params.vote, "vote_budget", "undo_vote_budget")
+            with arg.match("sweep") as sweep_id:
+                self.count_vote(self.data.sweep_proposals, self.data.sweep_ballots, sweep_id, params.vote, "vote_sweep", "undo_vote_sweep")
+
+    def count_vote(self, proposals, ballots, proposal_id, vote, vote_tag, undo_tag):
+        sp.if vote:
+            self.add_vote(proposals, ballots, proposal_id, vote_tag)
+        sp.else:
+            self.remove_vote(proposals, ballots, proposal_id, undo_tag)
+
+    # Record the sender's ballot and bump the proposal tally
+    # Ballots are keyed by (proposal_id, address), so a vote costs
+    # the same no matter how many owners there are.
+    # Voting twice leaves the tally unchanged, like adding to the old vote set
+    # tag names the event emitted for the vote
+    def add_vote(self, proposals, ballots, proposal_id, tag):
+        self.verify_not_expired(proposals[proposal_id])
+        ballot = sp.pair(proposal_id, sp.sender)
+        sp.if ~ballots.contains(ballot):
+            ballots[ballot] = sp.unit
+            proposals[proposal_id].num_votes += 1
+        self.emit_vote(proposals, proposal_id, tag)
+
+    # Remove the sender's ballot and decrement the proposal tally
+    # Undoing a vote that wasn't cast leaves the tally unchanged
+    def remove_vote(self, proposals, ballots, proposal_id, tag):
+        ballot = sp.pair(proposal_id, sp.sender)
+        sp.if ballots.contains(ballot):
+            del ballots[ballot]
+            proposals[proposal_id].num_votes = sp.as_nat(proposals[proposal_id].num_votes - 1)
+        self.emit_vote(proposals, proposal_id, tag)
+
+    def emit_vote(self, proposals, proposal_id, tag):
+        sp.emit(sp.record(
+            proposal_id=proposal_id,
+            voter=sp.sender,
+            num_votes=proposals[proposal_id].num_votes
+        ), tag=tag)
+
+    # Mark a buy or cancel_swap proposal as passed, creating it if needed
+    # Used when a proposal is approved without on-chain votes
+    def mark_passed(self, proposals, proposal_id):
+        sp.if proposals.contains(proposal_id):
+            sp.verify(~proposals[proposal_id].passed)
+            self.verify_not_expired(proposals[proposal_id])
+            proposals[proposal_id].passed = True
+        sp.else:
+            proposals[proposal_id] = sp.record(num_votes=0, passed=True, created=sp.level)
+
+    # Fail if the proposal's lifetime has run out
+    def verify_not_expired(self, proposal):
+        sp.if self.data.proposal_lifetime.is_some():
+            sp.verify(sp.level <= proposal.created + self.data.proposal_lifetime.open_some())
+
+    # Delete a passed or expired proposal along with all of its ballots
+    # voters must list every owner with a ballot on the proposal
+    def prune(self, proposals, ballots, proposal_id, voters):
+        sp.verify(proposals.contains(proposal_id))
+
+        sp.if ~proposals[proposal_id].passed:
+            sp.verify(
+                self.data.proposal_lifetime.is_some() &
+                (sp.level > proposals[proposal_id].created + self.data.proposal_lifetime.open_some())
+            )
+
+        sp.for voter in voters:
+            ballot = sp.pair(proposal_id, voter)
+            sp.verify(ballots.contains(ballot))
+            del ballots[ballot]
+
+        # No ballots can be left behind for a future proposal with the same id
+        sp.verify(sp.len(voters) == proposals[proposal_id].num_votes)
+        del proposals[proposal_id]
+
+    ### Liquidation Helpers ###
+    # An owner's split of real_total based on their equity,
+    # minus what they already liquidated
+    def claimable(self, owner, real_total):
+        return self.claimable_share(owner, real_total) - self.data.liquidated_ledger.get(owner, sp.mutez(0))
+
+    def claimable_share(self, owner, real_total):
+        return sp.split_tokens(
+            self.data.equity.get(owner, sp.mutez(0)),
+            sp.utils.mutez_to_nat(real_total),
+            sp.utils.mutez_to_nat(self.data.total_contributed)
+        )
+
+    # Record the payout in the ledger and send it
+    def pay_out(self, owner, amount):
+        sp.if self.data.liquidated_ledger.contains(owner):
+            self.data.liquidated_ledger[owner] += amount
+        sp.else:
+            self.data.liquidated_ledger[owner] = amount
+
+        self.data.total_liquidated += amount
+
+        sp.send(owner, amount)
+
+        sp.emit(sp.record(owner=owner, amount=amount), tag="liquidate")
+
+    ### HEN Contract Functions ###
+    # hen_collect, hen_swap and hen_cancel_swap are lambdas, every vote kind,
+    # execute_signed and collect_within_budget share one copy of their code
+    @sp.private_lambda(with_storage="read-only", with_operations=True, wrap_call=True)
+    def hen_collect(self, params):
+        sp.set_type(params, sp.TRecord(swap_id=sp.TNat, price=sp.TMutez))
+
+        c = sp.contract(sp.TNat, self.data.hen_address, entry_point = "collect").open_some()
+        sp.transfer(params.swap_id, params.price, c)
+
+        sp.emit(sp.record(swap_id=params.swap_id, price=params.price), tag="collect")
+
+    # Collect every item of a sweep proposal
+    # The items can't change after propose_sweep checked them against the cap
+    # A swap that is gone makes HEN fail, which reverts the whole sweep
+    def hen_sweep(self, sweep_id):
+        sp.for item in self.data.sweep_proposals[sweep_id].items:
+            self.hen_collect(sp.record(swap_id=item.swap_id, price=item.price))
+
+    def sweep_total(self, items):
+        total = sp.local("total", sp.mutez(0))
+        sp.for item in items:
+            total.value += item.price
+        return total.value
+
+    @sp.private_lambda(with_storage="read-write", with_operations=True, wrap_call=True)
+    def hen_swap(self, swap_proposal_id):
+        sp.set_type(swap_proposal_id, sp.TNat)
+
+        # Check that the swap exists
+        sp.if ~self.data.swap_proposals.contains(swap_proposal_id):
+            sp.failwith("swap doesn't exist")
+
+        # Get swap info
+        swap_info = self.data.swap_proposals[swap_proposal_id]
+
+        # A reprice takes the old listing down first, by the swap_id registered now
+        # A listing cancelled or cleared since has nothing left to take down
+        sp.if self.data.reprices.contains(swap_proposal_id):
+            sp.if self.data.listings.contains(self.data.reprices[swap_proposal_id]):
+                self.send_cancel_swap(self.listing_swap_id(self.data.reprices[swap_proposal_id]))
+            del self.data.reprices[swap_proposal_id]
+
+        # First, you need to update operators
+        # Example https://tzkt.io/opGfD9TeKG145Rn427t32KVU3fPs74VucUxNLYGxZ7iN5yrPeJ8/11567483
+        # A single update_operators call covers every token that isn't already granted,
+        # and it is skipped entirely when all of them are
+        operators = sp.local("operators", sp.list([], OPERATOR_UPDATE_TYPE))
+        sp.for swap in swap_info.swaps:
+            sp.if ~self.data.hen_operators.contains(swap.objkt_id):
+                self.data.hen_operators[swap.objkt_id] = sp.unit
+                operators.value.push(sp.variant("add_operator", sp.record(
+                    owner=sp.self_address,
+                    operator=self.data.hen_address,
+                    token_id=swap.objkt_id
+                )))
+
+        sp.if sp.len(operators.value) > 0:
+            sp.transfer(operators.value, sp.mutez(0), self.nft_operators_contract())
+
+        # Call into HEN contract
+        c = sp.contract(HEN_SWAP_TYPE, self.data.hen_address, entry_point = "swap").open_some()
+        sp.for swap in swap_info.swaps:
+            sp.transfer(
+                sp.record(
+                    creator=swap.creator,
+                    objkt_amount=swap.objkt_amount,
+                    objkt_id=swap.objkt_id,
+                    royalties=100,
+                    xtz_per_objkt=swap.xtz_per_objkt
+                ),
+                sp.mutez(0), c)
+
+            # Replaces an earlier listing of the same objkt in the index,
+            # that swap can still be cancelled by its swap_id
+            sp.if self.data.listings.contains(swap.objkt_id):
+                self.remove_listing(swap.objkt_id)
+            self.data.listings[swap.objkt_id] = sp.record(swap=swap, swap_proposal_id=swap_proposal_id, swap_id=sp.none)
+
+        # The listings themselves stay readable in swap_proposals
+        sp.emit(swap_proposal_id, tag="swap")
+
+    def nft_operators_contract(self):
+        return sp.contract(sp.TList(OPERATOR_UPDATE_TYPE),
+            self.data.hen_nft_address,
+            entry_point="update_operators").open_some()
+
+    @sp.private_lambda(with_storage="read-write", with_operations=True, wrap_call=True)
+    def hen_cancel_swap(self, swap_id):
+        sp.set_type(swap_id, sp.TNat)
+
+        self.send_cancel_swap(swap_id)
+
+    # The body of hen_cancel_swap, hen_swap uses it for reprices so it
+    # doesn't call one lambda from another
+    def send_cancel_swap(self, swap_id):
+        c = sp.contract(sp.TNat, self.data.hen_address, entry_point = "cancel_swap").open_some()
+        sp.transfer(swap_id, sp.mutez(0), c)
+
+        sp.if self.data.listing_swap_ids.contains(swap_id):
+            self.remove_listing(self.data.listing_swap_ids[swap_id])
+
+        sp.emit(swap_id, tag="cancel_swap")
+
+    ### Listing Helpers ###
+    def listing_swap_id(self, objkt_id):
+        sp.verify(self.data.listings.contains(objkt_id), "not listed")
+        return self.data.listings[objkt_id].swap_id.open_some("swap_id not registered")
+
+    def remove_listing(self, objkt_id):
+        sp.if self.data.listings[objkt_id].swap_id.is_some():
+            del self.data.listing_swap_ids[self.data.listings[objkt_id].swap_id.open_some()]
+        del self.data.listings[objkt_id]
+
+# Originates a HENDao per group in a single call and keeps a registry of them
+# Each DAO gets its own contract because HEN pays sale proceeds and FA2 tokens
+# to the lister's address, so funds and NFTs can only be kept apart per address
+class HENDaoFactory(sp.Contract):
+    def __init__(self):
+        self.dao = HENDao([])
+        self.init(
+            daos=sp.big_map({}, sp.TNat, sp.TAddress),
+            next_dao_id=sp.nat(0)
+        )
+
+    # Create a DAO for owners, see HENDao for proposal_lifetime
+    # metadata_url is the optional TZIP-16 location as bytes, like
+    # sp.utils.bytes_of_string("ipfs://..."), stored under the "" key
+    @sp.entry_point
+    def create_dao(self, owners, proposal_lifetime, metadata_url):
+        sp.set_type(owners, sp.TList(sp.TAddress))
+        sp.set_type(proposal_lifetime, sp.TOption(sp.TNat))
+        sp.set_type(metadata_url, sp.TOption(sp.TBytes))
+
+        owner_set = sp.local("owner_set", sp.big_map({}, sp.TAddress, sp.TUnit))
+        owner_index = sp.local("owner_index", sp.big_map({}, sp.TNat, sp.TAddress))
+        num_owners = sp.local("num_owners", sp.nat(0))
+        sp.for owner in owners:
+            # A duplicate owner would make unanimous votes impossible
+            sp.verify(~owner_set.value.contains(owner))
+            owner_set.value[owner] = sp.unit
+            owner_index.value[num_owners.value] = owner
+            num_owners.value += 1
+
+        sp.verify(num_owners.value > 0)
+
+        metadata = sp.local("metadata", sp.big_map({}, sp.TString, sp.TBytes))
+        sp.if metadata_url.is_some():
+            metadata.value[""] = metadata_url.open_some()
+
+        dao = sp.local("dao", sp.create_contract(
+            contract=self.dao,
+            storage=sp.record(**dao_storage(
+                owners=owner_set.value,
+                num_owners=num_owners.value,
+                owner_index=owner_index.value,
+                proposal_lifetime=proposal_lifetime,
+                metadata=metadata.value
+            ))
+        ))
+
+        self.data.daos[self.data.next_dao_id] = dao.value
+        sp.emit(sp.record(dao_id=self.data.next_dao_id, address=dao.value), tag="create_dao")
+        self.data.next_dao_id += 1
+
+if "templates" not in __name__:
+    @sp.add_test(name = "test_full_flow")
+    def test():
+        c1 = HENDao([sp.address("tz1owner1"), sp.address("tz1owner2")])
+        stub = HENStubTester()
+        stub.set_initial_balance(sp.mutez(10000))
+        
+        scenario = sp.test_scenario()
+        scenario.h1("Full flow test")
+        scenario += c1
+        scenario += stub
+    
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        hacker = sp.address("tz1hacker")
+
+        c1.deposit().run(sender=user1, amount= sp.mutez(10))
+        scenario.verify(c1.data.equity[user1] == sp.mutez(10))
+        c1.deposit().run(sender=user1, amount= sp.mutez(5))
+        scenario.verify(c1.data.equity[user1] == sp.mutez(15))
+        scenario.verify(c1.data.total_contributed == sp.mutez(15))
+        
+        # Test withdraw
+        c1.withdraw(sp.mutez(5)).run(sender=user1)
+        scenario.verify(c1.data.equity[user1] == sp.mutez(10))
+        scenario.verify(c1.data.total_contributed == sp.mutez(10))
+        c1.deposit().run(sender=user1, amount= sp.mutez(5))
+
+        
+        # Hacker should not be able to deposit
+        c1.deposit().run(valid=False, sender=hacker, amount=sp.mutez(10))
+        
+        # Second user deposits
+        c1.deposit().run(sender=user2, amount=sp.mutez(45))
+        scenario.verify(c1.data.equity[user2] == sp.mutez(45))
+        scenario.verify(c1.data.total_contributed == sp.mutez(60))
+        
+        # First user can't withdraw more than they put in
+        c1.withdraw(sp.mutez(50)).run(valid=False)
+        
+        # Fund is locked
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+        
+        # Deposits should be disabled
+        c1.deposit().run(sender=user1, amount= sp.mutez(10), valid=False)
+        c1.deposit().run(sender=user2, amount= sp.mutez(10), valid=False)
+        
+        # NFT is sold
+        scenario.h1("NFT is sold")
+        stub.simulate_purchase(dest=c1.address, amount=sp.mutez(100)).run(sender=user1)
+        scenario.verify(c1.balance == sp.mutez(160))
+        
+        # Fund is closed
+        c1.vote_close(True).run(sender=user1)
+        c1.vote_close(True).run(sender=user2)
+        
+        # user1 has equity 15/60 = 25%
+        # user2 has equity 45/60 = 75%;
+        # Total balance after sale is 160
+        # user1 owns 0.25 * 160 = 40
+        # user2 owns 0.75 * 160 = 120
+
+        # user1 withdraws
+        c1.liquidate().run(sender=user1)
+        scenario.verify(c1.balance == sp.mutez(120))
+        
+        # Can't liquidate again if you have no funds left
+        c1.liquidate().run(sender=user1, valid=False)
+
+        # user2 withdraws
+        c1.liquidate().run(sender=user2)
+        scenario.verify(c1.balance == sp.mutez(0))
+        
+        # New sale is made
+        stub.simulate_purchase(dest=c1.address, amount=sp.mutez(100)).run(sender=user1)
+        scenario.verify(c1.balance == sp.mutez(100))
         c1.liquidate().run(sender=user1)
         scenario.verify(c1.balance == sp.mutez(75))
         
@@ -455,7 +1539,18 @@ if "templates" not in __name__:
         # Test undo
         c1.vote_buy(swap_id=sp.nat(456), objkt_amount=sp.nat(1), price=sp.mutez(5)).run(sender=user1)
         c1.undo_vote_buy(456).run(sender=user1)
-        scenario.verify(c1.data.buy_proposals[456].votes.contains(user1) == False)
+        scenario.verify(c1.data.buy_ballots.contains(sp.pair(456, user1)) == False)
+        scenario.verify(c1.data.buy_proposals[456].num_votes == 0)
+
+        # Voting twice before it passes counts once
+        c1.vote_buy(swap_id=sp.nat(456), objkt_amount=sp.nat(1), price=sp.mutez(5)).run(sender=user1)
+        c1.vote_buy(swap_id=sp.nat(456), objkt_amount=sp.nat(1), price=sp.mutez(5)).run(sender=user1)
+        scenario.verify(c1.data.buy_proposals[456].num_votes == 1)
+        scenario.verify(c1.data.buy_proposals[456].passed == False)
+
+        # Undoing a vote that wasn't cast changes nothing
+        c1.undo_vote_buy(456).run(sender=user2)
+        scenario.verify(c1.data.buy_proposals[456].num_votes == 1)
 
 
     @sp.add_test(name = "test_lock_and_close")
@@ -475,9 +1570,17 @@ if "templates" not in __name__:
         
         # Undo and redo lock
         c1.vote_lock(False).run(sender=user1)
-        scenario.verify(~c1.data.lock_votes.contains(user1))
+        scenario.verify(~c1.data.phase_ballots.contains(sp.pair("lock", user1)))
+        scenario.verify(c1.data.lock_votes == 0)
+        c1.vote_lock(True).run(sender=user1)
+        scenario.verify(c1.data.phase_ballots.contains(sp.pair("lock", user1)))
+
+        # Voting twice only counts once, undoing a missing vote changes nothing
         c1.vote_lock(True).run(sender=user1)
-        scenario.verify(c1.data.lock_votes.contains(user1))
+        scenario.verify(c1.data.lock_votes == 1)
+        scenario.verify(c1.data.locked == False)
+        c1.vote_lock(False).run(sender=user2)
+        scenario.verify(c1.data.lock_votes == 1)
 
         scenario.h2("Contract is unlocked when everyone locks")
         c1.vote_lock(True).run(sender=user2)
@@ -491,9 +1594,12 @@ if "templates" not in __name__:
         
         # Undo and redo
         c1.vote_close(False).run(sender=user1)
-        scenario.verify(~c1.data.close_votes.contains(user1))
+        scenario.verify(~c1.data.phase_ballots.contains(sp.pair("close", user1)))
+        scenario.verify(c1.data.close_votes == 0)
         c1.vote_close(True).run(sender=user1)
-        scenario.verify(c1.data.close_votes.contains(user1))
+        scenario.verify(c1.data.phase_ballots.contains(sp.pair("close", user1)))
+        c1.vote_close(True).run(sender=user1)
+        scenario.verify(c1.data.close_votes == 1)
         
         # All users vote for close
         c1.vote_close(True).run(sender=user2)
@@ -518,9 +1624,18 @@ if "templates" not in __name__:
         
         # Undo votes
         c1.vote_swap(0).run(sender=user1)
-        scenario.verify(c1.data.swap_proposals[0].votes.contains(user1))
+        scenario.verify(c1.data.swap_ballots.contains(sp.pair(0, user1)))
+        c1.undo_vote_swap(0).run(sender=user1)
+        scenario.verify(~c1.data.swap_ballots.contains(sp.pair(0, user1)))
+
+        # Undoing again or voting twice leaves the tally where it was
         c1.undo_vote_swap(0).run(sender=user1)
-        scenario.verify(~c1.data.swap_proposals[0].votes.contains(user1))
+        scenario.verify(c1.data.swap_proposals[0].num_votes == 0)
+        c1.vote_swap(1).run(sender=user1)
+        c1.vote_swap(1).run(sender=user1)
+        scenario.verify(c1.data.swap_proposals[1].num_votes == 1)
+        scenario.verify(c1.data.swap_proposals[1].passed == False)
+        c1.undo_vote_swap(1).run(sender=user1)
         
         
         scenario.h2("All votes for a swap")
@@ -535,7 +1650,7 @@ if "templates" not in __name__:
         c1.vote_swap(0).run(sender=user2, valid=False)
 
         # Verify that num votes is valid
-        scenario.verify(sp.len(c1.data.swap_proposals[0].votes) == 2)
+        scenario.verify(c1.data.swap_proposals[0].num_votes == 2)
         
         # Verify that proposal is passed
         scenario.verify(c1.data.swap_proposals[0].passed == True)
@@ -544,5 +1659,704 @@ if "templates" not in __name__:
         # Can't undo after passed
         c1.undo_vote_swap(0).run(sender=user1, valid=False)
 
+    @sp.add_test(name = "test_vote_tally")
+    def test():
+        c1 = HENDao([sp.address("tz1owner1"), sp.address("tz1owner2"), sp.address("tz1owner3")])
+        scenario = sp.test_scenario()
+        scenario.h1("Test Vote Tally")
+        scenario += c1
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        user3 = sp.address("tz1owner3")
+
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+        c1.vote_lock(True).run(sender=user3)
+
+        scenario.h2("Buy votes are tallied per ballot")
+        c1.vote_buy(swap_id=sp.nat(123), price=sp.mutez(0)).run(sender=user1)
+        scenario.verify(c1.data.buy_proposals[123].num_votes == 1)
+        scenario.verify(c1.data.buy_ballots.contains(sp.pair(123, user1)))
+
+        # Double vote before passing isn't double counted
+        c1.vote_buy(swap_id=sp.nat(123), price=sp.mutez(0)).run(sender=user1)
+        scenario.verify(c1.data.buy_proposals[123].num_votes == 1)
+
+        # Undo only takes back the sender's own vote
+        c1.undo_vote_buy(123).run(sender=user2)
+        scenario.verify(c1.data.buy_proposals[123].num_votes == 1)
+        c1.undo_vote_buy(123).run(sender=user1)
+        scenario.verify(c1.data.buy_proposals[123].num_votes == 0)
+        scenario.verify(~c1.data.buy_ballots.contains(sp.pair(123, user1)))
+
+        # Everyone votes and the buy passes
+        c1.vote_buy(swap_id=sp.nat(123), price=sp.mutez(0)).run(sender=user1)
+        c1.vote_buy(swap_id=sp.nat(123), price=sp.mutez(0)).run(sender=user2)
+        scenario.verify(c1.data.buy_proposals[123].passed == False)
+        c1.vote_buy(swap_id=sp.nat(123), price=sp.mutez(0)).run(sender=user3)
+        scenario.verify(c1.data.buy_proposals[123].num_votes == 3)
+        scenario.verify(c1.data.buy_proposals[123].passed == True)
+        c1.undo_vote_buy(123).run(sender=user3, valid=False)
+
+        scenario.h2("Cancel swap votes are tallied per ballot")
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user1)
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user1)
+        scenario.verify(c1.data.cancel_swap_proposals[7].num_votes == 1)
+        c1.undo_vote_cancel_swap(sp.nat(7)).run(sender=user1)
+        scenario.verify(c1.data.cancel_swap_proposals[7].num_votes == 0)
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user1)
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user2)
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user3)
+        scenario.verify(c1.data.cancel_swap_proposals[7].passed == True)
+
+        # Can't vote or undo after passed
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user1, valid=False)
+        c1.undo_vote_cancel_swap(sp.nat(7)).run(sender=user1, valid=False)
+
+        # Hackers can't vote
+        c1.vote_cancel_swap(sp.nat(8)).run(sender=sp.address("tz1hacker"), valid=False)
+
+    @sp.add_test(name = "test_many_owners")
+    def test():
+        owners = [sp.address("tz1owner%d" % i) for i in range(20)]
+        c1 = HENDao(owners)
+        scenario = sp.test_scenario()
+        scenario.h1("Test Many Owners")
+        scenario += c1
+
+        scenario.h2("Owner membership is read from the big_map")
+        c1.deposit().run(sender=owners[19], amount=sp.mutez(10))
+        c1.deposit().run(sender=sp.address("tz1hacker"), amount=sp.mutez(10), valid=False)
+
+        for owner in owners:
+            c1.vote_lock(True).run(sender=owner)
+        scenario.verify(c1.data.locked == True)
+
+        scenario.h2("Unanimity is checked against numOwners")
+        for owner in owners[:-1]:
+            c1.vote_buy(swap_id=sp.nat(1), price=sp.mutez(0)).run(sender=owner)
+        scenario.verify(c1.data.buy_proposals[1].passed == False)
+        c1.vote_buy(swap_id=sp.nat(1), price=sp.mutez(0)).run(sender=owners[-1])
+        scenario.verify(c1.data.buy_proposals[1].passed == True)
+
+    @sp.add_test(name = "test_execute_signed")
+    def test():
+        owner1 = sp.test_account("owner1")
+        owner2 = sp.test_account("owner2")
+        hacker = sp.test_account("hacker")
+        c1 = HENDao([owner1.address, owner2.address])
+        scenario = sp.test_scenario()
+        scenario.h1("Test Execute Signed")
+        scenario += c1
+
+        def sign(account, action, nonce):
+            message = sp.pack(sp.record(contract=c1.address, action=action, nonce=nonce))
+            return sp.record(
+                public_key=account.public_key,
+                signature=sp.make_signature(account.secret_key, message, message_format="Raw")
+            )
+
+        buy = sp.variant("buy", sp.record(swap_id=sp.nat(123), price=sp.mutez(0)))
+
+        scenario.h2("Signed actions are disabled when unlocked")
+        c1.execute_signed(action=buy, signatures=[sign(owner1, buy, 0), sign(owner2, buy, 0)]).run(sender=hacker.address, valid=False)
+
+        c1.vote_lock(True).run(sender=owner1.address)
+        c1.vote_lock(True).run(sender=owner2.address)
+
+        scenario.h2("Every owner has to sign")
+        c1.execute_signed(action=buy, signatures=[sign(owner1, buy, 0)]).run(sender=hacker.address, valid=False)
+        c1.execute_signed(action=buy, signatures=[sign(owner1, buy, 0), sign(owner1, buy, 0)]).run(sender=hacker.address, valid=False)
+        c1.execute_signed(action=buy, signatures=[sign(owner1, buy, 0), sign(hacker, buy, 0)]).run(sender=hacker.address, valid=False)
+
+        scenario.h2("Signatures must match the action")
+        other_buy = sp.variant("buy", sp.record(swap_id=sp.nat(123), price=sp.mutez(5)))
+        c1.execute_signed(action=buy, signatures=[sign(owner1, buy, 0), sign(owner2, other_buy, 0)]).run(sender=hacker.address, valid=False)
+
+        scenario.h2("Anyone can relay a fully signed buy")
+        c1.execute_signed(action=buy, signatures=[sign(owner1, buy, 0), sign(owner2, buy, 0)]).run(sender=hacker.address)
+        scenario.verify(c1.data.buy_proposals[123].passed == True)
+        scenario.verify(c1.data.nonces[owner1.address] == 1)
+        scenario.verify(c1.data.nonces[owner2.address] == 1)
+
+        scenario.h2("Signatures can't be replayed")
+        cancel = sp.variant("cancel_swap", sp.nat(7))
+        c1.execute_signed(action=cancel, signatures=[sign(owner1, cancel, 0), sign(owner2, cancel, 0)]).run(sender=hacker.address, valid=False)
+        c1.execute_signed(action=cancel, signatures=[sign(owner1, cancel, 1), sign(owner2, cancel, 1)]).run(sender=hacker.address)
+        scenario.verify(c1.data.cancel_swap_proposals[7].passed == True)
+
+        scenario.h2("Signed swaps need an open proposal")
+        swap = sp.variant("swap", sp.nat(0))
+        c1.execute_signed(action=swap, signatures=[sign(owner1, swap, 2), sign(owner2, swap, 2)]).run(sender=hacker.address, valid=False)
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(100), creator=owner2.address).run(sender=owner1.address)
+        c1.execute_signed(action=swap, signatures=[sign(owner1, swap, 2), sign(owner2, swap, 2)]).run(sender=hacker.address)
+        scenario.verify(c1.data.swap_proposals[0].passed == True)
+
+        # Existing votes still work alongside signed actions
+        c1.vote_buy(swap_id=sp.nat(456), price=sp.mutez(0)).run(sender=owner1.address)
+        c1.vote_buy(swap_id=sp.nat(456), price=sp.mutez(0)).run(sender=owner2.address)
+        scenario.verify(c1.data.buy_proposals[456].passed == True)
+
+    @sp.add_test(name = "test_vote_batch")
+    def test():
+        c1 = HENDao([sp.address("tz1owner1"), sp.address("tz1owner2")])
+        scenario = sp.test_scenario()
+        scenario.h1("Test Vote Batch")
+        scenario += c1
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1)
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(456), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1)
+
+        scenario.h2("One owner votes on everything at once")
+        c1.vote_batch([
+            sp.variant("vote_buy", sp.record(swap_id=sp.nat(1), price=sp.mutez(0))),
+            sp.variant("vote_buy", sp.record(swap_id=sp.nat(2), price=sp.mutez(0))),
+            sp.variant("vote_swap", sp.nat(0)),
+            sp.variant("vote_swap", sp.nat(1)),
+            sp.variant("vote_cancel_swap", sp.nat(7)),
+            sp.variant("undo_vote_buy", sp.nat(2))
+        ]).run(sender=user1)
+        scenario.verify(c1.data.buy_proposals[1].num_votes == 1)
+        scenario.verify(c1.data.buy_proposals[2].num_votes == 0)
+        scenario.verify(c1.data.swap_proposals[1].num_votes == 1)
+        scenario.verify(c1.data.cancel_swap_proposals[7].num_votes == 1)
+
+        scenario.h2("Batches are atomic")
+        c1.vote_batch([
+            sp.variant("vote_swap", sp.nat(0)),
+            sp.variant("vote_swap", sp.nat(5))
+        ]).run(sender=user2, valid=False)
+        scenario.verify(c1.data.swap_proposals[0].num_votes == 1)
+
+        # Hackers can't batch vote
+        c1.vote_batch([sp.variant("vote_swap", sp.nat(0))]).run(sender=sp.address("tz1hacker"), valid=False)
+
+        scenario.h2("Every proposal reaching unanimity executes")
+        c1.vote_batch([
+            sp.variant("vote_buy", sp.record(swap_id=sp.nat(1), price=sp.mutez(0))),
+            sp.variant("vote_swap", sp.nat(0)),
+            sp.variant("vote_cancel_swap", sp.nat(7))
+        ]).run(sender=user2)
+        scenario.verify(c1.data.buy_proposals[1].passed == True)
+        scenario.verify(c1.data.swap_proposals[0].passed == True)
+        scenario.verify(c1.data.cancel_swap_proposals[7].passed == True)
+        scenario.verify(c1.data.swap_proposals[1].passed == False)
+
+    @sp.add_test(name = "test_propose_swaps")
+    def test():
+        c1 = HENDao([sp.address("tz1owner1"), sp.address("tz1owner2")])
+        scenario = sp.test_scenario()
+        scenario.h1("Test Propose Swaps")
+        scenario += c1
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+
+        swaps = [
+            sp.record(objkt_amount=sp.nat(1), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(100), creator=user2),
+            sp.record(objkt_amount=sp.nat(2), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(200), creator=user2),
+            sp.record(objkt_amount=sp.nat(1), objkt_id=sp.nat(456), xtz_per_objkt=sp.mutez(300), creator=user1)
+        ]
+
+        scenario.h2("Bundles need a locked contract and at least one swap")
+        c1.propose_swaps(swaps).run(sender=user1, valid=False)
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+        c1.propose_swaps([]).run(sender=user1, valid=False)
+        c1.propose_swaps(swaps).run(sender=sp.address("tz1hacker"), valid=False)
+
+        scenario.h2("A bundle passes like a single swap")
+        c1.propose_swaps(swaps).run(sender=user1)
+        scenario.verify(sp.len(c1.data.swap_proposals[0].swaps) == 3)
+        c1.vote_swap(0).run(sender=user1)
+        c1.undo_vote_swap(0).run(sender=user1)
+        c1.vote_swap(0).run(sender=user1)
+        scenario.verify(c1.data.swap_proposals[0].passed == False)
+        c1.vote_swap(0).run(sender=user2)
+        scenario.verify(c1.data.swap_proposals[0].passed == True)
+
+        # Each token is only granted once
+        scenario.verify(c1.data.hen_operators.contains(123))
+        scenario.verify(c1.data.hen_operators.contains(456))
+
+        # Single swaps share the same proposal ids
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(789), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1)
+        scenario.verify(sp.len(c1.data.swap_proposals[1].swaps) == 1)
+        scenario.verify(c1.data.swap_proposal_id == 2)
+
+    @sp.add_test(name = "test_operator_cache")
+    def test():
+        c1 = HENDao([sp.address("tz1owner1"), sp.address("tz1owner2")])
+        scenario = sp.test_scenario()
+        scenario.h1("Test Operator Cache")
+        scenario += c1
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+
+        scenario.h2("The first swap of a token grants the operator")
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1)
+        c1.vote_swap(0).run(sender=user1)
+        c1.vote_swap(0).run(sender=user2)
+        scenario.verify(c1.data.hen_operators.contains(123))
+
+        scenario.h2("Relisting reuses the cached operator")
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(50), creator=user2).run(sender=user1)
+        c1.vote_swap(1).run(sender=user1)
+        c1.vote_swap(1).run(sender=user2)
+        scenario.verify(c1.data.swap_proposals[1].passed == True)
+        scenario.verify(c1.data.hen_operators.contains(123))
+
+        scenario.h2("Owners can revoke operators")
+        c1.revoke_operators([sp.nat(123), sp.nat(999)]).run(sender=sp.address("tz1hacker"), valid=False)
+        c1.revoke_operators([sp.nat(123), sp.nat(999)]).run(sender=user1)
+        scenario.verify(~c1.data.hen_operators.contains(123))
+
+    @sp.add_test(name = "test_prune_proposals")
+    def test():
+        c1 = HENDao([sp.address("tz1owner1"), sp.address("tz1owner2")], proposal_lifetime=10)
+        scenario = sp.test_scenario()
+        scenario.h1("Test Prune Proposals")
+        scenario += c1
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+
+        c1.vote_lock(True).run(sender=user1, level=1)
+        c1.vote_lock(True).run(sender=user2, level=1)
+
+        # Passed buy, open swap, expired cancel
+        c1.vote_buy(swap_id=sp.nat(1), price=sp.mutez(0)).run(sender=user1, level=1)
+        c1.vote_buy(swap_id=sp.nat(1), price=sp.mutez(0)).run(sender=user2, level=1)
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1, level=5)
+        c1.vote_swap(0).run(sender=user1, level=5)
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user1, level=2)
+
+        scenario.h2("Expired proposals can't be voted on")
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user2, level=13, valid=False)
+
+        scenario.h2("Open proposals can't be pruned")
+        c1.prune_proposals([
+            sp.record(proposal=sp.variant("swap", sp.nat(0)), voters=[user1])
+        ]).run(sender=user1, level=13, valid=False)
+
+        scenario.h2("Every ballot must be pruned with its proposal")
+        c1.prune_proposals([
+            sp.record(proposal=sp.variant("buy", sp.nat(1)), voters=[user1])
+        ]).run(sender=user1, level=13, valid=False)
+        c1.prune_proposals([
+            sp.record(proposal=sp.variant("buy", sp.nat(1)), voters=[user1, user1])
+        ]).run(sender=user1, level=13, valid=False)
+
+        # Hackers can't prune
+        c1.prune_proposals([
+            sp.record(proposal=sp.variant("buy", sp.nat(1)), voters=[user1, user2])
+        ]).run(sender=sp.address("tz1hacker"), level=13, valid=False)
+
+        scenario.h2("Passed and expired proposals are pruned")
+        c1.prune_proposals([
+            sp.record(proposal=sp.variant("buy", sp.nat(1)), voters=[user1, user2]),
+            sp.record(proposal=sp.variant("cancel_swap", sp.nat(7)), voters=[user1])
+        ]).run(sender=user2, level=13)
+        scenario.verify(~c1.data.buy_proposals.contains(1))
+        scenario.verify(~c1.data.buy_ballots.contains(sp.pair(1, user1)))
+        scenario.verify(~c1.data.buy_ballots.contains(sp.pair(1, user2)))
+        scenario.verify(~c1.data.cancel_swap_proposals.contains(7))
+        scenario.verify(~c1.data.cancel_swap_ballots.contains(sp.pair(7, user1)))
+
+        # A pruned cancel proposal can be started again
+        c1.vote_cancel_swap(sp.nat(7)).run(sender=user1, level=14)
+        scenario.verify(c1.data.cancel_swap_proposals[7].num_votes == 1)
+
+        # The swap expires later, once it does it can be pruned
+        c1.vote_swap(0).run(sender=user2, level=16, valid=False)
+        c1.prune_proposals([
+            sp.record(proposal=sp.variant("swap", sp.nat(0)), voters=[user1])
+        ]).run(sender=user1, level=16)
+        scenario.verify(~c1.data.swap_proposals.contains(0))
+
+        scenario.h2("Pruning an expired reprice drops its reprices entry")
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(456), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1, level=20)
+        c1.vote_swap(1).run(sender=user1, level=20)
+        c1.vote_swap(1).run(sender=user2, level=20)
+        c1.register_listing(objkt_id=456, swap_id=900).run(sender=user1, level=20)
+        c1.propose_reprice(objkt_id=456, objkt_amount=1, xtz_per_objkt=sp.mutez(50)).run(sender=user1, level=20)
+        scenario.verify(c1.data.reprices[2] == 456)
+        c1.prune_proposals([
+            sp.record(proposal=sp.variant("swap", sp.nat(2)), voters=[])
+        ]).run(sender=user1, level=31)
+        scenario.verify(~c1.data.swap_proposals.contains(2))
+        scenario.verify(~c1.data.reprices.contains(2))
+
+    @sp.add_test(name = "test_liquidate_all")
+    def test():
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        user3 = sp.address("tz1owner3")
+        c1 = HENDao([user1, user2, user3])
+        stub = HENStubTester()
+        stub.set_initial_balance(sp.mutez(10000))
+
+        scenario = sp.test_scenario()
+        scenario.h1("Test Liquidate All")
+        scenario += c1
+        scenario += stub
+
+        c1.deposit().run(sender=user1, amount=sp.mutez(15))
+        c1.deposit().run(sender=user2, amount=sp.mutez(45))
+        # user3 never deposits
+
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+        c1.vote_lock(True).run(sender=user3)
+
+        stub.simulate_purchase(dest=c1.address, amount=sp.mutez(100)).run(sender=user1)
+
+        scenario.h2("Payouts are only allowed once closed")
+        c1.liquidate_all(start=0, limit=3).run(sender=user1, valid=False)
+
+        c1.vote_close(True).run(sender=user1)
+        c1.vote_close(True).run(sender=user2)
+        c1.vote_close(True).run(sender=user3)
+
+        # Hackers can't trigger payouts
+        c1.liquidate_all(start=0, limit=3).run(sender=sp.address("tz1hacker"), valid=False)
+
+        scenario.h2("Everyone is paid in one call")
+        c1.liquidate_all(start=0, limit=10).run(sender=user3)
+        scenario.verify(c1.balance == sp.mutez(0))
+        scenario.verify(c1.data.liquidated_ledger[user1] == sp.mutez(40))
+        scenario.verify(c1.data.liquidated_ledger[user2] == sp.mutez(120))
+        scenario.verify(~c1.data.liquidated_ledger.contains(user3))
+        scenario.verify(c1.data.total_liquidated == sp.mutez(160))
+
+        scenario.h2("Payouts can be split with a cursor")
+        stub.simulate_purchase(dest=c1.address, amount=sp.mutez(100)).run(sender=user1)
+        c1.liquidate_all(start=0, limit=1).run(sender=user1)
+        scenario.verify(c1.balance == sp.mutez(75))
+
+        scenario.h2("Pull based liquidate stays consistent")
+        stub.simulate_purchase(dest=c1.address, amount=sp.mutez(100)).run(sender=user1)
+        c1.liquidate().run(sender=user2)
+        scenario.verify(c1.balance == sp.mutez(25))
+        c1.liquidate_all(start=1, limit=2).run(sender=user1)
+        scenario.verify(c1.balance == sp.mutez(25))
+        c1.liquidate_all(start=0, limit=1).run(sender=user1)
+        scenario.verify(c1.balance == sp.mutez(0))
+
+    @sp.add_test(name = "test_lazy_entry_points")
+    def test():
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        c1 = HENDao([user1, user2], lazy_entry_points=True)
+        scenario = sp.test_scenario()
+        scenario.h1("Test Lazy Entry Points")
+        scenario += c1
+
+        scenario.h2("Hot and lazy entry points behave the same")
+        c1.deposit().run(sender=user1, amount=sp.mutez(10))
+        c1.withdraw(sp.mutez(5)).run(sender=user1)
+        scenario.verify(c1.data.equity[user1] == sp.mutez(5))
+
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+        scenario.verify(c1.data.locked == True)
+
+        c1.vote_buy(swap_id=sp.nat(1), price=sp.mutez(0)).run(sender=user1)
+        c1.vote_buy(swap_id=sp.nat(1), price=sp.mutez(0)).run(sender=user2)
+        scenario.verify(c1.data.buy_proposals[1].passed == True)
+
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1)
+        c1.vote_swap(0).run(sender=user1)
+        c1.vote_swap(0).run(sender=user2)
+        scenario.verify(c1.data.swap_proposals[0].passed == True)
+
+        c1.vote_close(True).run(sender=user1)
+        c1.vote_close(True).run(sender=user2)
+        c1.liquidate().run(sender=user1)
+        scenario.verify(c1.balance == sp.mutez(0))
+
+    @sp.add_test(name = "test_views")
+    def test():
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        c1 = HENDao([user1, user2])
+        stub = HENStubTester()
+        stub.set_initial_balance(sp.mutez(10000))
+        scenario = sp.test_scenario()
+        scenario.h1("Test Views")
+        scenario += c1
+        scenario += stub
+
+        c1.deposit().run(sender=user1, amount=sp.mutez(15))
+        c1.deposit().run(sender=user2, amount=sp.mutez(45))
+
+        scenario.h2("Phase")
+        scenario.verify(c1.get_phase().locked == False)
+        c1.vote_lock(True).run(sender=user1)
+        scenario.verify(c1.get_phase().lock_votes == 1)
+        c1.vote_lock(True).run(sender=user2)
+        scenario.verify(c1.get_phase().locked == True)
+
+        scenario.h2("Proposal tallies")
+        c1.vote_buy(swap_id=sp.nat(1), price=sp.mutez(0)).run(sender=user1)
+        proposals = c1.get_proposals([sp.variant("buy", sp.nat(1)), sp.variant("swap", sp.nat(0))])
+        scenario.verify(sp.len(proposals) == 2)
+        scenario.verify_equal(proposals, [
+            sp.some(sp.record(num_votes=1, passed=False, created=0)),
+            sp.none
+        ])
+
+        scenario.h2("Nothing is claimable until closed")
+        stub.simulate_purchase(dest=c1.address, amount=sp.mutez(100)).run(sender=user1)
+        scenario.verify(c1.get_owners([user1]).owners[user1].claimable == sp.mutez(0))
+        scenario.verify(c1.get_owners([user1]).owners[user1].equity == sp.mutez(15))
+        scenario.verify(c1.get_owners([user1]).total_contributed == sp.mutez(60))
+
+        c1.vote_close(True).run(sender=user1)
+        c1.vote_close(True).run(sender=user2)
+
+        scenario.h2("Claimable matches liquidate")
+        scenario.verify(c1.get_owners([user1, user2]).owners[user1].claimable == sp.mutez(40))
+        scenario.verify(c1.get_owners([user1, user2]).owners[user2].claimable == sp.mutez(120))
+        c1.liquidate().run(sender=user1)
+        scenario.verify(c1.get_owners([user1]).owners[user1].claimable == sp.mutez(0))
+        scenario.verify(c1.get_owners([user1]).owners[user1].liquidated == sp.mutez(40))
+        scenario.verify(c1.get_owners([sp.address("tz1hacker")]).owners[sp.address("tz1hacker")].claimable == sp.mutez(0))
+
+    @sp.add_test(name = "test_budget")
+    def test():
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        c1 = HENDao([user1, user2])
+        scenario = sp.test_scenario()
+        scenario.h1("Test Budget")
+        scenario += c1
+
+        c1.deposit().run(sender=user1, amount=sp.mutez(100))
+        c1.deposit().run(sender=user2, amount=sp.mutez(100))
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+
+        scenario.h2("Budgets need every owner's vote")
+        c1.propose_budget(max_price=sp.mutez(30), spend_cap=sp.mutez(50), min_swap_id=1, expiry=100).run(sender=user1, level=10)
+        c1.propose_budget(max_price=sp.mutez(30), spend_cap=sp.mutez(50), min_swap_id=1, expiry=10).run(sender=user1, level=10, valid=False)
+        c1.vote_budget(0).run(sender=user1, level=11)
+        c1.collect_within_budget(budget_id=0, swap_id=1, price=sp.mutez(10)).run(sender=user1, level=11, valid=False)
+        c1.vote_budget(0).run(sender=user2, level=11)
+        scenario.verify(c1.data.budget_proposals[0].passed)
+        scenario.verify(c1.data.budgets[0].spent == sp.mutez(0))
+        c1.undo_vote_budget(0).run(sender=user1, level=11, valid=False)
+
+        scenario.h2("Any owner collects within the budget")
+        # Swap 2 is listed on HEN after the vote, the floor covers it
+        c1.collect_within_budget(budget_id=0, swap_id=1, price=sp.mutez(30)).run(sender=user2, level=12)
+        c1.collect_within_budget(budget_id=0, swap_id=2, price=sp.mutez(20)).run(sender=user1, level=12)
+        scenario.verify(c1.data.budgets[0].spent == sp.mutez(50))
+        scenario.verify(c1.balance == sp.mutez(150))
+
+        scenario.h2("Limits are enforced")
+        c1.propose_budget(max_price=sp.mutez(30), spend_cap=sp.mutez(50), min_swap_id=3, expiry=100).run(sender=user1, level=12)
+        c1.vote_batch([sp.variant("vote_budget", 1)]).run(sender=user1, level=12)
+        c1.vote_batch([sp.variant("vote_budget", 1)]).run(sender=user2, level=12)
+        # Spend cap
+        c1.collect_within_budget(budget_id=0, swap_id=3, price=sp.mutez(1)).run(sender=user1, level=12, valid=False)
+        # Max price
+        c1.collect_within_budget(budget_id=1, swap_id=3, price=sp.mutez(31)).run(sender=user1, level=12, valid=False)
+        # Swaps older than the floor
+        c1.collect_within_budget(budget_id=1, swap_id=2, price=sp.mutez(10)).run(sender=user1, level=12, valid=False)
+        # Outsiders
+        c1.collect_within_budget(budget_id=1, swap_id=3, price=sp.mutez(10)).run(sender=sp.address("tz1hacker"), level=12, valid=False)
+
+        scenario.h2("Any owner can revoke a budget")
+        c1.revoke_budget(1).run(sender=user2, level=13)
+        scenario.verify(~c1.data.budgets.contains(1))
+        c1.collect_within_budget(budget_id=1, swap_id=3, price=sp.mutez(10)).run(sender=user1, level=13, valid=False)
+
+        scenario.h2("Passed budget proposals can be pruned")
+        c1.prune_proposals([sp.record(proposal=sp.variant("budget", 1), voters=[user1, user2])]).run(sender=user1, level=13)
+        scenario.verify(~c1.data.budget_proposals.contains(1))
+
+        scenario.h2("Swaps listed after the vote are covered")
+        # HEN's next swap_id is 1000 when the budget is proposed
+        c1.propose_budget(max_price=sp.mutez(30), spend_cap=sp.mutez(30), min_swap_id=1000, expiry=100).run(sender=user1, level=14)
+        c1.vote_budget(2).run(sender=user1, level=14)
+        c1.vote_budget(2).run(sender=user2, level=14)
+        # Swap 1004 didn't exist when the owners voted, one owner collects it before it sells out
+        c1.collect_within_budget(budget_id=2, swap_id=1004, price=sp.mutez(25)).run(sender=user2, level=20)
+        scenario.verify(c1.data.budgets[2].spent == sp.mutez(25))
+        scenario.verify(c1.balance == sp.mutez(125))
+        c1.collect_within_budget(budget_id=2, swap_id=999, price=sp.mutez(5)).run(sender=user1, level=20, valid=False)
+
+        scenario.h2("Budgets expire")
+        c1.collect_within_budget(budget_id=0, swap_id=3, price=sp.mutez(0)).run(sender=user1, level=100)
+        c1.collect_within_budget(budget_id=0, swap_id=3, price=sp.mutez(0)).run(sender=user1, level=101, valid=False)
+
+    @sp.add_test(name = "test_sweep")
+    def test():
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        user3 = sp.address("tz1owner3")
+        c1 = HENDao([user1, user2, user3])
+        scenario = sp.test_scenario()
+        scenario.h1("Test Sweep")
+        scenario += c1
+
+        c1.deposit().run(sender=user1, amount=sp.mutez(100))
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+        c1.vote_lock(True).run(sender=user3)
+
+        items = [
+            sp.record(swap_id=1, price=sp.mutez(10)),
+            sp.record(swap_id=2, price=sp.mutez(20)),
+            sp.record(swap_id=3, price=sp.mutez(30))
+        ]
+
+        scenario.h2("The cap must cover the items")
+        c1.propose_sweep(items=items, cap=sp.mutez(59)).run(sender=user1, valid=False)
+        c1.propose_sweep(items=[], cap=sp.mutez(59)).run(sender=user1, valid=False)
+
+        scenario.h2("One round collects every item")
+        scenario.p("3 swaps through vote_buy take 3 rounds of 3 votes, 9 operations and 3 proposals in storage. The sweep takes 1 proposal and 3 votes, 4 operations.")
+        c1.propose_sweep(items=items, cap=sp.mutez(60)).run(sender=user1)
+        c1.vote_sweep(0).run(sender=user1)
+        c1.undo_vote_sweep(0).run(sender=user1)
+        c1.vote_batch([sp.variant("vote_sweep", 0)]).run(sender=user1)
+        c1.vote_sweep(0).run(sender=user2)
+        scenario.verify(c1.balance == sp.mutez(100))
+        scenario.verify(~c1.data.sweep_proposals[0].passed)
+        c1.vote_sweep(0).run(sender=user3)
+        scenario.verify(c1.data.sweep_proposals[0].passed)
+        scenario.verify(c1.balance == sp.mutez(40))
+        c1.vote_sweep(0).run(sender=user3, valid=False)
+        c1.undo_vote_sweep(0).run(sender=user1, valid=False)
+
+        scenario.h2("Sweeps the DAO can't pay for fail")
+        c1.propose_sweep(items=items, cap=sp.mutez(60)).run(sender=user2)
+        c1.vote_sweep(1).run(sender=user1)
+        c1.vote_sweep(1).run(sender=user2)
+        c1.vote_sweep(1).run(sender=user3, valid=False)
+        scenario.verify(~c1.data.sweep_proposals[1].passed)
+
+        scenario.h2("Passed sweeps can be pruned")
+        c1.prune_proposals([sp.record(proposal=sp.variant("sweep", 0), voters=[user1, user2, user3])]).run(sender=user1)
+        scenario.verify(~c1.data.sweep_proposals.contains(0))
+
+    @sp.add_test(name = "test_listings")
+    def test():
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        hacker_address = sp.address("tz1hacker")
+        c1 = HENDao([user1, user2])
+        scenario = sp.test_scenario()
+        scenario.h1("Test Listings")
+        scenario += c1
+
+        c1.vote_lock(True).run(sender=user1)
+        c1.vote_lock(True).run(sender=user2)
+
+        scenario.h2("Passed swaps are indexed by objkt_id")
+        c1.propose_swap(objkt_amount=sp.nat(2), objkt_id=sp.nat(123), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1)
+        c1.vote_swap(0).run(sender=user1)
+        c1.vote_swap(0).run(sender=user2)
+        scenario.verify(c1.data.listings[123].swap_proposal_id == 0)
+        scenario.verify(c1.data.listings[123].swap_id.is_none())
+        scenario.verify(c1.get_listings([123, 456])[123].is_some())
+        scenario.verify(c1.get_listings([123, 456])[456].is_none())
+
+        scenario.h2("Cancelling and repricing need the swap_id")
+        c1.vote_cancel_listing(123).run(sender=user1, valid=False)
+        c1.propose_reprice(objkt_id=123, objkt_amount=1, xtz_per_objkt=sp.mutez(50)).run(sender=user1, valid=False)
+        c1.register_listing(objkt_id=123, swap_id=9000).run(sender=hacker_address, valid=False)
+        c1.register_listing(objkt_id=123, swap_id=8999).run(sender=user1)
+
+        scenario.h2("A wrong swap_id can be registered over")
+        c1.register_listing(objkt_id=123, swap_id=9000).run(sender=user2)
+        scenario.verify(c1.data.listings[123].swap_id == sp.some(9000))
+        scenario.verify(c1.data.listing_swap_ids[9000] == 123)
+        scenario.verify(~c1.data.listing_swap_ids.contains(8999))
+        c1.register_listing(objkt_id=123, swap_id=9000).run(sender=user1, valid=False)
+
+        scenario.h2("Reprice by objkt_id, with what is left of the listing")
+        c1.propose_reprice(objkt_id=123, objkt_amount=1, xtz_per_objkt=sp.mutez(50)).run(sender=user1)
+        scenario.verify(c1.data.reprices[1] == 123)
+        # Correcting the swap_id while the reprice is open, it cancels the corrected one
+        c1.register_listing(objkt_id=123, swap_id=9001).run(sender=user2)
+        c1.vote_swap(1).run(sender=user1)
+        c1.vote_swap(1).run(sender=user2)
+        scenario.verify(~c1.data.reprices.contains(1))
+        scenario.verify(~c1.data.listing_swap_ids.contains(9001))
+        scenario.verify(c1.data.listings[123].swap_proposal_id == 1)
+        scenario.verify(c1.data.listings[123].swap.xtz_per_objkt == sp.mutez(50))
+        scenario.verify(c1.data.listings[123].swap.objkt_amount == 1)
+
+        scenario.h2("Cancel by objkt_id")
+        c1.register_listing(objkt_id=123, swap_id=9005).run(sender=user2)
+        c1.vote_cancel_listing(123).run(sender=user1)
+        c1.vote_cancel_swap(9005).run(sender=user2)
+        scenario.verify(c1.data.cancel_swap_proposals[9005].passed)
+        scenario.verify(~c1.data.listings.contains(123))
+        scenario.verify(~c1.data.listing_swap_ids.contains(9005))
+
+        scenario.h2("Sold listings are cleared by a vote")
+        c1.propose_swap(objkt_amount=sp.nat(1), objkt_id=sp.nat(456), xtz_per_objkt=sp.mutez(100), creator=user2).run(sender=user1)
+        c1.vote_swap(2).run(sender=user1)
+        c1.vote_swap(2).run(sender=user2)
+        c1.vote_clear_listing(456).run(sender=user1, valid=False)
+        c1.register_listing(objkt_id=456, swap_id=9010).run(sender=user1)
+        c1.vote_clear_listing(456).run(sender=hacker_address, valid=False)
+        c1.vote_clear_listing(456).run(sender=user1)
+        c1.undo_vote_clear_listing(9010).run(sender=user1)
+        c1.vote_clear_listing(456).run(sender=user1)
+        scenario.verify(c1.data.listings.contains(456))
+        c1.vote_clear_listing(456).run(sender=user2)
+        scenario.verify(c1.data.clear_listing_proposals[9010].passed)
+        scenario.verify(~c1.data.listings.contains(456))
+        scenario.verify(~c1.data.listing_swap_ids.contains(9010))
+        c1.prune_proposals([sp.record(proposal=sp.variant("clear_listing", 9010), voters=[user1, user2])]).run(sender=user1)
+        scenario.verify(~c1.data.clear_listing_proposals.contains(9010))
+
+    @sp.add_test(name = "test_factory")
+    def test():
+        user1 = sp.address("tz1owner1")
+        user2 = sp.address("tz1owner2")
+        user3 = sp.address("tz1owner3")
+        factory = HENDaoFactory()
+        scenario = sp.test_scenario()
+        scenario.h1("Test Factory")
+        scenario += factory
+
+        scenario.h2("Each group gets its own DAO")
+        metadata_url = sp.utils.bytes_of_string("ipfs://henDaoMetadata")
+        factory.create_dao(owners=[user1, user2], proposal_lifetime=sp.none, metadata_url=sp.some(metadata_url)).run(sender=user1)
+        factory.create_dao(owners=[user2, user3], proposal_lifetime=sp.some(100), metadata_url=sp.none).run(sender=user3)
+        scenario.verify(factory.data.next_dao_id == 2)
+        scenario.verify(factory.data.daos.contains(0))
+        scenario.verify(factory.data.daos[0] != factory.data.daos[1])
+
+        scenario.h2("Owner lists are checked")
+        factory.create_dao(owners=[], proposal_lifetime=sp.none, metadata_url=sp.none).run(sender=user1, valid=False)
+        factory.create_dao(owners=[user1, user1], proposal_lifetime=sp.none, metadata_url=sp.none).run(sender=user1, valid=False)
+
+        scenario.h2("DAOs run independently")
+        dao0 = scenario.dynamic_contract(0, factory.dao)
+        dao1 = scenario.dynamic_contract(1, factory.dao)
+        dao0.call("deposit", sp.unit).run(sender=user1, amount=sp.mutez(10))
+        dao0.call("deposit", sp.unit).run(sender=user3, amount=sp.mutez(10), valid=False)
+        dao1.call("deposit", sp.unit).run(sender=user3, amount=sp.mutez(20))
+        scenario.verify(dao0.balance == sp.mutez(10))
+        scenario.verify(dao1.balance == sp.mutez(20))
+        scenario.verify(dao0.data.numOwners == 2)
+        scenario.verify(dao1.data.owner_index[1] == user3)
+        scenario.verify(dao0.data.metadata[""] == metadata_url)
+        scenario.verify(~dao1.data.metadata.contains(""))
+
     # TODO Add the initial addresses here when deploying contract
     sp.add_compilation_target("henDao", HENDao([]))
+    sp.add_compilation_target("henDaoLazy", HENDao([], lazy_entry_points=True))
+    sp.add_compilation_target("henDaoFactory", HENDaoFactory())
@@ -0,0 +1,517 @@
+"""Incremental off-chain indexer for HENDao.
+
+Applies HENDao operations in order from a JSONL operation log and keeps the
+resulting state in SQLite, so the dashboard can ask for open proposals, who
+voted and what every owner can claim without fetching big_map keys one by one:
+
+    python indexer.py fixtures/operations.jsonl --db dao.sqlite --query open
+    python indexer.py fixtures/operations.jsonl --db dao.sqlite --query claimable
+
+Each line of the log is one applied operation:
+
+    {"id": 12, "level": 1500, "sender": "tz1...", "entrypoint": "vote_buy",
+     "parameters": {"swap_id": "123", "price": "5000000"}, "amount": "0"}
+
+The first operation is the origination with
+{"entrypoint": "origination", "parameters": {"owners": [...], "proposal_lifetime": null}}.
+Parameters use the JSON form of the Michelson values, records are objects,
+variants are single key objects and numbers may be strings. Failed operations
+must be left out of the log since they don't change storage.
+
+The last applied operation id is stored next to the state in the same
+transaction, so running the indexer again only applies new operations.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+
+from model import split_tokens
+
+# Operations applied per transaction
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+CREATE TABLE IF NOT EXISTS owners (
+    address TEXT PRIMARY KEY,
+    idx INTEGER NOT NULL,
+    equity INTEGER NOT NULL DEFAULT 0,
+    liquidated INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS phase_votes (
+    phase TEXT NOT NULL,
+    address TEXT NOT NULL,
+    PRIMARY KEY (phase, address)
+);
+CREATE TABLE IF NOT EXISTS proposals (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    num_votes INTEGER NOT NULL DEFAULT 0,
+    passed INTEGER NOT NULL DEFAULT 0,
+    created INTEGER NOT NULL,
+    swaps TEXT,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS open_proposals ON proposals (passed, kind);
+CREATE TABLE IF NOT EXISTS listings (
+    objkt_id INTEGER PRIMARY KEY,
+    swap_proposal_id INTEGER NOT NULL,
+    swap_id INTEGER UNIQUE,
+    swap TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reprices (
+    swap_proposal_id INTEGER PRIMARY KEY,
+    objkt_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS budgets (
+    id INTEGER PRIMARY KEY,
+    max_price INTEGER NOT NULL,
+    spend_cap INTEGER NOT NULL,
+    min_swap_id INTEGER NOT NULL,
+    expiry INTEGER NOT NULL,
+    spent INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'proposed'
+);
+CREATE TABLE IF NOT EXISTS ballots (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    PRIMARY KEY (kind, id, address)
+);
+"""
+
+META_DEFAULTS = {
+    "last_op_id": -1,
+    "level": 0,
+    "num_owners": 0,
+    "proposal_lifetime": None,
+    "locked": 0,
+    "closed": 0,
+    "balance": 0,
+    "total_contributed": 0,
+    "total_liquidated": 0,
+    "swap_proposal_id": 0,
+    "budget_proposal_id": 0,
+    "sweep_proposal_id": 0,
+}
+
+
+def nat(value):
+    """Numbers come as strings in Michelson JSON."""
+    return int(value)
+
+
+def variant(value):
+    """Split a single key variant object into (case, value)."""
+    (case, arg), = value.items()
+    return case, arg
+
+
+class Indexer:
+    """HENDao state in SQLite, updated one operation at a time."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.db.executemany(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+            META_DEFAULTS.items()
+        )
+        self.db.commit()
+        self.meta = self.load_meta()
+
+    def close(self):
+        self.db.close()
+
+    ### Log processing ###
+    def index_file(self, path):
+        """Apply every operation after the last checkpoint, returns how many were applied."""
+        applied = 0
+        with open(path) as f:
+            batch = []
+            for line in f:
+                if not line.strip():
+                    continue
+                op = json.loads(line)
+                if op["id"] <= self.meta["last_op_id"]:
+                    continue
+                batch.append(op)
+                if len(batch) >= BATCH_SIZE:
+                    applied += self.apply_batch(batch)
+                    batch = []
+            applied += self.apply_batch(batch)
+        return applied
+
+    def apply_batch(self, ops):
+        """Apply operations and move the checkpoint in one transaction."""
+        if not ops:
+            return 0
+        try:
+            with self.db:
+                for op in ops:
+                    self.apply(op)
+                self.save_meta()
+        except Exception:
+            # The tables were rolled back, meta has to follow or the next batch
+            # would resume from a checkpoint that was never saved
+            self.meta = self.load_meta()
+            raise
+        return len(ops)
+
+    def load_meta(self):
+        return dict(self.db.execute("SELECT key, value FROM meta"))
+
+    def save_meta(self):
+        self.db.executemany("UPDATE meta SET value = ? WHERE key = ?", [(v, k) for k, v in self.meta.items()])
+
+    def apply(self, op):
+        self.meta["last_op_id"] = op["id"]
+        self.meta["level"] = op["level"]
+        self.amount = nat(op.get("amount", 0))
+        self.meta["balance"] += self.amount
+        self.sender = op["sender"]
+        handler = getattr(self, "on_" + op["entrypoint"], None)
+        if handler is not None:
+            handler(op.get("parameters"))
+
+    ### Entrypoints ###
+    def on_origination(self, params):
+        owners = params["owners"]
+        self.db.executemany(
+            "INSERT OR IGNORE INTO owners (address, idx) VALUES (?, ?)",
+            [(owner, i) for i, owner in enumerate(owners)]
+        )
+        self.meta["num_owners"] = len(owners)
+        lifetime = params.get("proposal_lifetime")
+        self.meta["proposal_lifetime"] = None if lifetime is None else nat(lifetime)
+
+    def on_vote_lock(self, vote):
+        if self.phase_vote("lock", vote) == self.meta["num_owners"]:
+            self.meta["locked"] = 1
+
+    def on_vote_close(self, vote):
+        if self.phase_vote("close", vote) == self.meta["num_owners"]:
+            self.meta["closed"] = 1
+
+    def on_deposit(self, params):
+        self.db.execute("UPDATE owners SET equity = equity + ? WHERE address = ?", (self.amount, self.sender))
+        self.meta["total_contributed"] += self.amount
+
+    def on_withdraw(self, amount):
+        amount = nat(amount)
+        self.db.execute("UPDATE owners SET equity = equity - ? WHERE address = ?", (amount, self.sender))
+        self.meta["total_contributed"] -= amount
+        self.meta["balance"] -= amount
+
+    def on_liquidate(self, params):
+        real_total = self.meta["balance"] + self.meta["total_liquidated"]
+        self.pay_out(self.sender, self.claimable(self.sender, real_total))
+
+    def on_liquidate_all(self, params):
+        real_total = self.meta["balance"] + self.meta["total_liquidated"]
+        start, limit = nat(params["start"]), nat(params["limit"])
+        owners = self.db.execute(
+            "SELECT address FROM owners WHERE idx >= ? AND idx < ? AND equity > 0 ORDER BY idx",
+            (start, start + limit)
+        ).fetchall()
+        for (owner,) in owners:
+            amount = self.claimable(owner, real_total)
+            if amount > 0:
+                self.pay_out(owner, amount)
+
+    def on_vote_buy(self, params):
+        self.vote_buy(nat(params["swap_id"]), nat(params["price"]))
+
+    def on_undo_vote_buy(self, swap_id):
+        self.remove_vote("buy", nat(swap_id))
+
+    def on_propose_swap(self, params):
+        self.propose_swaps([params])
+
+    def on_propose_swaps(self, swaps):
+        self.propose_swaps(swaps)
+
+    def on_vote_swap(self, swap_proposal_id):
+        if self.vote("swap", nat(swap_proposal_id)):
+            self.hen_swap(nat(swap_proposal_id))
+
+    def on_undo_vote_swap(self, swap_proposal_id):
+        self.remove_vote("swap", nat(swap_proposal_id))
+
+    def on_vote_cancel_swap(self, swap_id):
+        if self.vote("cancel_swap", nat(swap_id)):
+            self.hen_cancel_swap(nat(swap_id))
+
+    def on_undo_vote_cancel_swap(self, swap_id):
+        self.remove_vote("cancel_swap", nat(swap_id))
+
+    def on_propose_sweep(self, params):
+        self.db.execute(
+            "INSERT INTO proposals (kind, id, created, swaps) VALUES ('sweep', ?, ?, ?)",
+            (self.meta["sweep_proposal_id"], self.meta["level"], json.dumps(params["items"]))
+        )
+        self.meta["sweep_proposal_id"] += 1
+
+    def on_vote_sweep(self, sweep_id):
+        if self.vote("sweep", nat(sweep_id)):
+            (items,), = self.db.execute(
+                "SELECT swaps FROM proposals WHERE kind = 'sweep' AND id = ?", (nat(sweep_id),)
+            ).fetchall()
+            self.meta["balance"] -= sum(nat(item["price"]) for item in json.loads(items))
+
+    def on_undo_vote_sweep(self, sweep_id):
+        self.remove_vote("sweep", nat(sweep_id))
+
+    def on_propose_budget(self, params):
+        budget_id = self.meta["budget_proposal_id"]
+        self.db.execute(
+            "INSERT INTO proposals (kind, id, created) VALUES ('budget', ?, ?)",
+            (budget_id, self.meta["level"])
+        )
+        self.db.execute(
+            "INSERT INTO budgets (id, max_price, spend_cap, min_swap_id, expiry) VALUES (?, ?, ?, ?, ?)",
+            (budget_id, nat(params["max_price"]), nat(params["spend_cap"]), nat(params["min_swap_id"]), nat(params["expiry"]))
+        )
+        self.meta["budget_proposal_id"] += 1
+
+    def on_vote_budget(self, budget_id):
+        if self.vote("budget", nat(budget_id)):
+            self.db.execute("UPDATE budgets SET status = 'active' WHERE id = ?", (nat(budget_id),))
+
+    def on_undo_vote_budget(self, budget_id):
+        self.remove_vote("budget", nat(budget_id))
+
+    def on_collect_within_budget(self, params):
+        price = nat(params["price"])
+        self.db.execute("UPDATE budgets SET spent = spent + ? WHERE id = ?", (price, nat(params["budget_id"])))
+        self.meta["balance"] -= price
+
+    def on_revoke_budget(self, budget_id):
+        self.db.execute("UPDATE budgets SET status = 'revoked' WHERE id = ?", (nat(budget_id),))
+
+    def on_vote_batch(self, votes):
+        for vote in votes:
+            case, arg = variant(vote)
+            getattr(self, "on_" + case)(arg)
+
+    def on_execute_signed(self, params):
+        case, arg = variant(params["action"])
+        if case == "buy":
+            self.mark_passed("buy", nat(arg["swap_id"]))
+            self.meta["balance"] -= nat(arg["price"])
+        elif case == "swap":
+            self.mark_passed("swap", nat(arg))
+            self.hen_swap(nat(arg))
+        else:
+            self.mark_passed("cancel_swap", nat(arg))
+            self.hen_cancel_swap(nat(arg))
+
+    def on_register_listing(self, params):
+        # Replaces an earlier registration of the same listing
+        self.db.execute(
+            "UPDATE listings SET swap_id = ? WHERE objkt_id = ?",
+            (nat(params["swap_id"]), nat(params["objkt_id"]))
+        )
+
+    def on_vote_clear_listing(self, objkt_id):
+        swap_id = self.listing(nat(objkt_id))["swap_id"]
+        if self.vote("clear_listing", swap_id):
+            self.db.execute("DELETE FROM listings WHERE swap_id = ?", (swap_id,))
+
+    def on_undo_vote_clear_listing(self, swap_id):
+        self.remove_vote("clear_listing", nat(swap_id))
+
+    def on_vote_cancel_listing(self, objkt_id):
+        self.on_vote_cancel_swap(self.listing(nat(objkt_id))["swap_id"])
+
+    def on_propose_reprice(self, params):
+        listing = self.listing(nat(params["objkt_id"]))
+        swap = dict(listing["swap"], objkt_amount=params["objkt_amount"], xtz_per_objkt=params["xtz_per_objkt"])
+        self.db.execute(
+            "INSERT INTO reprices VALUES (?, ?)", (self.meta["swap_proposal_id"], listing["objkt_id"])
+        )
+        self.propose_swaps([swap])
+
+    def on_prune_proposals(self, items):
+        for item in items:
+            kind, proposal_id = variant(item["proposal"])
+            self.db.execute("DELETE FROM proposals WHERE kind = ? AND id = ?", (kind, nat(proposal_id)))
+            self.db.execute("DELETE FROM ballots WHERE kind = ? AND id = ?", (kind, nat(proposal_id)))
+            if kind == "swap":
+                self.db.execute("DELETE FROM reprices WHERE swap_proposal_id = ?", (nat(proposal_id),))
+
+    ### Helpers ###
+    def phase_vote(self, phase, vote):
+        if vote:
+            self.db.execute("INSERT OR IGNORE INTO phase_votes VALUES (?, ?)", (phase, self.sender))
+        else:
+            self.db.execute("DELETE FROM phase_votes WHERE phase = ? AND address = ?", (phase, self.sender))
+        return self.db.execute("SELECT COUNT(*) FROM phase_votes WHERE phase = ?", (phase,)).fetchone()[0]
+
+    def vote(self, kind, proposal_id):
+        """Record the sender's ballot, returns True when the proposal passes."""
+        self.db.execute(
+            "INSERT OR IGNORE INTO proposals (kind, id, created) VALUES (?, ?, ?)",
+            (kind, proposal_id, self.meta["level"])
+        )
+        # Voting twice leaves the tally unchanged
+        if self.db.execute("INSERT OR IGNORE INTO ballots VALUES (?, ?, ?)", (kind, proposal_id, self.sender)).rowcount:
+            self.db.execute(
+                "UPDATE proposals SET num_votes = num_votes + 1, passed = (num_votes + 1 = ?) WHERE kind = ? AND id = ?",
+                (self.meta["num_owners"], kind, proposal_id)
+            )
+        return self.db.execute(
+            "SELECT passed FROM proposals WHERE kind = ? AND id = ?", (kind, proposal_id)
+        ).fetchone()[0] == 1
+
+    def vote_buy(self, swap_id, price):
+        if self.vote("buy", swap_id):
+            self.meta["balance"] -= price
+
+    def remove_vote(self, kind, proposal_id):
+        deleted = self.db.execute(
+            "DELETE FROM ballots WHERE kind = ? AND id = ? AND address = ?", (kind, proposal_id, self.sender)
+        ).rowcount
+        if deleted:
+            self.db.execute("UPDATE proposals SET num_votes = num_votes - 1 WHERE kind = ? AND id = ?", (kind, proposal_id))
+
+    def mark_passed(self, kind, proposal_id):
+        self.db.execute(
+            "INSERT OR IGNORE INTO proposals (kind, id, created) VALUES (?, ?, ?)",
+            (kind, proposal_id, self.meta["level"])
+        )
+        self.db.execute("UPDATE proposals SET passed = 1 WHERE kind = ? AND id = ?", (kind, proposal_id))
+
+    def propose_swaps(self, swaps):
+        self.db.execute(
+            "INSERT INTO proposals (kind, id, created, swaps) VALUES ('swap', ?, ?, ?)",
+            (self.meta["swap_proposal_id"], self.meta["level"], json.dumps(swaps))
+        )
+        self.meta["swap_proposal_id"] += 1
+
+    def hen_swap(self, swap_proposal_id):
+        """Index the listings of a passed swap proposal."""
+        # A reprice cancels the swap_id the listing has now, it may have been registered over
+        reprice = self.db.execute(
+            "SELECT listings.swap_id FROM reprices JOIN listings USING (objkt_id) WHERE reprices.swap_proposal_id = ?",
+            (swap_proposal_id,)
+        ).fetchone()
+        if reprice:
+            self.hen_cancel_swap(reprice[0])
+        self.db.execute("DELETE FROM reprices WHERE swap_proposal_id = ?", (swap_proposal_id,))
+        (swaps,), = self.db.execute(
+            "SELECT swaps FROM proposals WHERE kind = 'swap' AND id = ?", (swap_proposal_id,)
+        ).fetchall()
+        for swap in json.loads(swaps):
+            self.db.execute(
+                "INSERT OR REPLACE INTO listings (objkt_id, swap_proposal_id, swap) VALUES (?, ?, ?)",
+                (nat(swap["objkt_id"]), swap_proposal_id, json.dumps(swap))
+            )
+
+    def hen_cancel_swap(self, swap_id):
+        self.db.execute("DELETE FROM listings WHERE swap_id = ?", (swap_id,))
+
+    def listing(self, objkt_id):
+        swap_proposal_id, swap_id, swap = self.db.execute(
+            "SELECT swap_proposal_id, swap_id, swap FROM listings WHERE objkt_id = ?", (objkt_id,)
+        ).fetchone()
+        return {"objkt_id": objkt_id, "swap_proposal_id": swap_proposal_id, "swap_id": swap_id, "swap": json.loads(swap)}
+
+    def claimable(self, owner, real_total):
+        row = self.db.execute("SELECT equity, liquidated FROM owners WHERE address = ?", (owner,)).fetchone()
+        equity, liquidated = row if row else (0, 0)
+        if self.meta["total_contributed"] == 0:
+            return 0
+        return split_tokens(equity, real_total, self.meta["total_contributed"]) - liquidated
+
+    def pay_out(self, owner, amount):
+        self.db.execute("UPDATE owners SET liquidated = liquidated + ? WHERE address = ?", (amount, owner))
+        self.meta["total_liquidated"] += amount
+        self.meta["balance"] -= amount
+
+    ### Queries ###
+    def open_proposals(self):
+        """Unpassed, unexpired proposals with their tally."""
+        rows = self.db.execute(
+            "SELECT kind, id, num_votes, created, swaps FROM proposals WHERE passed = 0 ORDER BY kind, id"
+        ).fetchall()
+        lifetime = self.meta["proposal_lifetime"]
+        return [
+            {"kind": kind, "id": proposal_id, "num_votes": num_votes, "created": created,
+             "swaps": json.loads(swaps) if swaps else None}
+            for kind, proposal_id, num_votes, created, swaps in rows
+            if lifetime is None or self.meta["level"] <= created + lifetime
+        ]
+
+    def active_budgets(self):
+        """Approved, unexpired budgets with what is left to spend."""
+        rows = self.db.execute(
+            "SELECT id, max_price, spend_cap, min_swap_id, expiry, spent FROM budgets"
+            " WHERE status = 'active' AND expiry >= ? ORDER BY id",
+            (self.meta["level"],)
+        ).fetchall()
+        return [
+            {"id": budget_id, "max_price": max_price, "remaining": spend_cap - spent,
+             "min_swap_id": min_swap_id, "expiry": expiry}
+            for budget_id, max_price, spend_cap, min_swap_id, expiry, spent in rows
+        ]
+
+    def all_listings(self):
+        """The DAO's current listing of each objkt, swap_id is None until registered."""
+        return [
+            self.listing(objkt_id)
+            for (objkt_id,) in self.db.execute("SELECT objkt_id FROM listings ORDER BY objkt_id").fetchall()
+        ]
+
+    def voters(self, kind, proposal_id):
+        return [address for (address,) in self.db.execute(
+            "SELECT address FROM ballots WHERE kind = ? AND id = ? ORDER BY address", (kind, proposal_id)
+        )]
+
+    def claimable_all(self):
+        """What liquidate() would pay each owner right now, 0 until closed."""
+        real_total = self.meta["balance"] + self.meta["total_liquidated"]
+        owners = [address for (address,) in self.db.execute("SELECT address FROM owners ORDER BY idx")]
+        return {
+            owner: max(self.claimable(owner, real_total), 0) if self.meta["closed"] else 0
+            for owner in owners
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index a HENDao operation log into SQLite")
+    parser.add_argument("log", help="JSONL operation log")
+    parser.add_argument("--db", default="hen_dao.sqlite")
+    parser.add_argument("--query", choices=["open", "voters", "claimable", "budgets", "listings"])
+    parser.add_argument("--kind", choices=["buy", "swap", "cancel_swap", "clear_listing", "budget", "sweep"], help="proposal kind for --query voters")
+    parser.add_argument("--id", type=int, help="proposal id for --query voters")
+    args = parser.parse_args(argv)
+
+    indexer = Indexer(args.db)
+    applied = indexer.index_file(args.log)
+    print("applied %d operations, checkpoint at %d" % (applied, indexer.meta["last_op_id"]), file=sys.stderr)
+
+    if args.query == "open":
+        result = indexer.open_proposals()
+    elif args.query == "voters":
+        result = indexer.voters(args.kind, args.id)
+    elif args.query == "claimable":
+        result = indexer.claimable_all()
+    elif args.query == "budgets":
+        result = indexer.active_budgets()
+    elif args.query == "listings":
+        result = indexer.all_listings()
+    else:
+        result = None
+    if result is not None:
+        print(json.dumps(result, indent=2))
+    indexer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,675 @@
+"""Pure Python reference model of the HENDao contract.
+
+Mirrors the storage and entrypoint checks of HENDao in contract.py closely
+enough to fuzz its accounting at high volume without SmartPy:
+
+    python model.py --runs 10000 --length 50 --owners 3 --jobs 0
+
+It runs about 2,000 sequences of 50 operations a second per core, around
+100,000 operations, and --jobs spreads the runs over several processes.
+That is far from hundreds of thousands of sequences a second: every
+operation goes through the interpreter for its checks and bookkeeping, and
+getting tens of millions of operations a second would take compiled code,
+not a dependency-free model.
+
+Every entrypoint either applies completely or raises ContractFailure and
+leaves the state untouched, like a failed Tezos operation. Traces that break
+an invariant can be exported as a SmartPy scenario with to_smartpy_scenario()
+to check the real contract behaves the same way.
+
+Covered are the phase votes, deposits and payouts, and the buy, swap,
+cancel_swap and sweep proposals with their ballots, vote_batch and pruning.
+Out of scope, so fuzzing says nothing about them:
+
+* execute_signed, it only adds signature checks in front of the same
+  executions as the vote entrypoints
+* budgets (propose_budget, vote_budget, collect_within_budget and
+  revoke_budget), a collect_within_budget spends the balance like a passed
+  vote_buy
+* listings and reprices (register_listing, vote_clear_listing,
+  vote_cancel_listing and propose_reprice), they don't affect accounting
+"""
+
+import argparse
+import collections
+import multiprocessing
+import random
+import sys
+import time
+
+# Same shape as the storage records in contract.py,
+# items and cap are only set on sweep proposals
+Proposal = collections.namedtuple("Proposal", ["num_votes", "passed", "created", "swaps", "items", "cap"], defaults=((), 0))
+Swap = collections.namedtuple("Swap", ["objkt_amount", "objkt_id", "xtz_per_objkt", "creator"])
+SweepItem = collections.namedtuple("SweepItem", ["swap_id", "price"])
+Operation = collections.namedtuple("Operation", ["entrypoint", "sender", "params", "amount", "level"])
+
+PROPOSAL_KINDS = ("buy", "swap", "cancel_swap", "sweep")
+
+# Entrypoints that can fail after they started changing state,
+# every other entrypoint runs all of its checks first
+ATOMIC_ENTRYPOINTS = {"withdraw", "liquidate", "liquidate_all", "vote_buy", "vote_sweep", "vote_batch", "prune_proposals"}
+
+
+class ContractFailure(Exception):
+    """Raised where the contract would fail the operation."""
+
+
+def verify(condition):
+    if not condition:
+        raise ContractFailure()
+
+
+def split_tokens(amount, quantity, total):
+    """sp.split_tokens, amount * quantity / total rounded down."""
+    verify(total != 0)
+    return amount * quantity // total
+
+
+def sub_mutez(a, b):
+    """Mutez subtraction fails instead of going negative."""
+    verify(a >= b)
+    return a - b
+
+
+class HENDaoModel:
+    """In-memory HENDao, amounts are in mutez."""
+
+    def __init__(self, owners, proposal_lifetime=None, balance=0):
+        self.owner_index = list(owners)
+        self.owners = set(owners)
+        self.num_owners = len(owners)
+        self.proposal_lifetime = proposal_lifetime
+        self.locked = False
+        self.closed = False
+        self.lock_votes = set()
+        self.close_votes = set()
+        self.total_contributed = 0
+        self.total_liquidated = 0
+        self.liquidated_ledger = {}
+        self.equity = {}
+        self.proposals = {kind: {} for kind in PROPOSAL_KINDS}
+        self.ballots = {kind: set() for kind in PROPOSAL_KINDS}
+        self.swap_proposal_id = 0
+        self.sweep_proposal_id = 0
+        self.hen_operators = set()
+        self.balance = balance
+
+        # Per call context, set by apply()
+        self.sender = None
+        self.level = 0
+        self.operations = []
+
+    ### Driver ###
+    def apply(self, op):
+        """Run one operation, returns the emitted operations.
+
+        Raises ContractFailure and restores the previous state if the
+        contract would reject it.
+        """
+        snapshot = self.snapshot() if op.entrypoint in ATOMIC_ENTRYPOINTS else None
+        self.sender = op.sender
+        self.level = op.level
+        self.operations = []
+        self.balance += op.amount
+        try:
+            getattr(self, "ep_" + op.entrypoint)(op.amount, **op.params)
+            # Outgoing transfers need the balance to cover them
+            verify(self.balance >= 0)
+        except ContractFailure:
+            if snapshot is None:
+                self.balance -= op.amount
+            else:
+                self.restore(snapshot)
+            raise
+        return self.operations
+
+    def snapshot(self):
+        return (
+            self.locked, self.closed, set(self.lock_votes), set(self.close_votes),
+            self.total_contributed, self.total_liquidated,
+            dict(self.liquidated_ledger), dict(self.equity),
+            {kind: dict(p) for kind, p in self.proposals.items()},
+            {kind: set(b) for kind, b in self.ballots.items()},
+            self.swap_proposal_id, self.sweep_proposal_id, set(self.hen_operators), self.balance,
+        )
+
+    def restore(self, snapshot):
+        (
+            self.locked, self.closed, self.lock_votes, self.close_votes,
+            self.total_contributed, self.total_liquidated,
+            self.liquidated_ledger, self.equity,
+            self.proposals, self.ballots,
+            self.swap_proposal_id, self.sweep_proposal_id, self.hen_operators, self.balance,
+        ) = snapshot
+
+    def is_owner(self):
+        return self.sender in self.owners
+
+    def send(self, kind, amount=0, **params):
+        self.balance -= amount
+        self.operations.append((kind, amount, params))
+
+    ### Entrypoints ###
+    def ep_vote_lock(self, amount, vote):
+        verify(not self.locked and self.is_owner())
+        if vote:
+            self.lock_votes.add(self.sender)
+        else:
+            self.lock_votes.discard(self.sender)
+        if len(self.lock_votes) == self.num_owners:
+            self.locked = True
+
+    def ep_vote_close(self, amount, vote):
+        verify(not self.closed and self.locked and self.is_owner())
+        if vote:
+            self.close_votes.add(self.sender)
+        else:
+            self.close_votes.discard(self.sender)
+        if len(self.close_votes) == self.num_owners:
+            self.closed = True
+
+    def ep_default(self, amount):
+        pass
+
+    def ep_deposit(self, amount):
+        verify(self.is_owner() and not self.locked)
+        self.equity[self.sender] = self.equity.get(self.sender, 0) + amount
+        self.total_contributed += amount
+
+    def ep_withdraw(self, amount, withdraw_amount):
+        verify(self.is_owner() and self.sender in self.equity)
+        verify(self.equity[self.sender] >= withdraw_amount)
+        self.equity[self.sender] -= withdraw_amount
+        self.total_contributed -= withdraw_amount
+        self.send("transfer", withdraw_amount, destination=self.sender)
+
+    def ep_liquidate(self, amount):
+        verify(self.is_owner() and self.closed)
+        real_total = self.balance + self.total_liquidated
+        amount_to_send = self.claimable(self.sender, real_total)
+        verify(amount_to_send > 0)
+        self.pay_out(self.sender, amount_to_send)
+
+    def ep_liquidate_all(self, amount, start, limit):
+        verify(self.is_owner() and self.closed)
+        real_total = self.balance + self.total_liquidated
+        for i in range(start, min(start + limit, self.num_owners)):
+            owner = self.owner_index[i]
+            if self.equity.get(owner, 0) > 0:
+                amount_to_send = self.claimable(owner, real_total)
+                if amount_to_send > 0:
+                    self.pay_out(owner, amount_to_send)
+
+    def ep_vote_buy(self, amount, swap_id, price):
+        self.cast_vote_buy(swap_id, price)
+
+    def ep_undo_vote_buy(self, amount, swap_id):
+        self.cast_undo_vote_buy(swap_id)
+
+    def ep_propose_swap(self, amount, objkt_amount, objkt_id, xtz_per_objkt, creator):
+        verify(self.is_owner() and self.locked)
+        swap = Swap(objkt_amount, objkt_id, xtz_per_objkt, creator)
+        self.proposals["swap"][self.swap_proposal_id] = Proposal(0, False, self.level, (swap,))
+        self.swap_proposal_id += 1
+
+    def ep_propose_swaps(self, amount, swaps):
+        verify(self.is_owner() and self.locked and len(swaps) > 0)
+        self.proposals["swap"][self.swap_proposal_id] = Proposal(0, False, self.level, tuple(swaps))
+        self.swap_proposal_id += 1
+
+    def ep_vote_swap(self, amount, swap_proposal_id):
+        self.cast_vote_swap(swap_proposal_id)
+
+    def ep_undo_vote_swap(self, amount, swap_proposal_id):
+        self.cast_undo_vote_swap(swap_proposal_id)
+
+    def ep_vote_cancel_swap(self, amount, swap_id):
+        self.cast_vote_cancel_swap(swap_id)
+
+    def ep_undo_vote_cancel_swap(self, amount, swap_id):
+        self.cast_undo_vote_cancel_swap(swap_id)
+
+    def ep_propose_sweep(self, amount, items, cap):
+        verify(self.is_owner() and self.locked and not self.closed)
+        verify(len(items) > 0 and sum(item.price for item in items) <= cap)
+        self.proposals["sweep"][self.sweep_proposal_id] = Proposal(0, False, self.level, (), tuple(items), cap)
+        self.sweep_proposal_id += 1
+
+    def ep_vote_sweep(self, amount, sweep_id):
+        self.cast_vote_sweep(sweep_id)
+
+    def ep_undo_vote_sweep(self, amount, sweep_id):
+        self.cast_undo_vote_sweep(sweep_id)
+
+    def ep_vote_batch(self, amount, votes):
+        for kind, arg in votes:
+            if kind == "vote_buy":
+                self.cast_vote_buy(*arg)
+            else:
+                getattr(self, "cast_" + kind)(arg)
+
+    def ep_revoke_operators(self, amount, token_ids):
+        verify(self.is_owner())
+        removed = []
+        for token_id in token_ids:
+            if token_id in self.hen_operators:
+                self.hen_operators.discard(token_id)
+                removed.append(token_id)
+        if removed:
+            self.send("update_operators", remove=removed)
+
+    def ep_prune_proposals(self, amount, proposals):
+        verify(self.is_owner())
+        for kind, proposal_id, voters in proposals:
+            self.prune(kind, proposal_id, voters)
+
+    ### Voting Helpers ###
+    def cast_vote_buy(self, swap_id, price):
+        verify(self.is_owner() and self.locked and not self.closed)
+        buys = self.proposals["buy"]
+        if swap_id in buys:
+            verify(not buys[swap_id].passed)
+        else:
+            buys[swap_id] = Proposal(0, False, self.level, ())
+        self.add_vote("buy", swap_id)
+        if buys[swap_id].num_votes == self.num_owners:
+            self.send("collect", price, swap_id=swap_id)
+            buys[swap_id] = buys[swap_id]._replace(passed=True)
+
+    def cast_undo_vote_buy(self, swap_id):
+        verify(self.is_owner() and self.locked and not self.closed)
+        verify(swap_id in self.proposals["buy"] and not self.proposals["buy"][swap_id].passed)
+        self.remove_vote("buy", swap_id)
+
+    def cast_vote_swap(self, swap_proposal_id):
+        swaps = self.proposals["swap"]
+        verify(self.is_owner() and self.locked)
+        verify(swap_proposal_id in swaps and not swaps[swap_proposal_id].passed)
+        self.add_vote("swap", swap_proposal_id)
+        if swaps[swap_proposal_id].num_votes == self.num_owners:
+            self.hen_swap(swaps[swap_proposal_id])
+            swaps[swap_proposal_id] = swaps[swap_proposal_id]._replace(passed=True)
+
+    def cast_undo_vote_swap(self, swap_proposal_id):
+        swaps = self.proposals["swap"]
+        verify(self.is_owner() and self.locked)
+        verify(swap_proposal_id in swaps and not swaps[swap_proposal_id].passed)
+        self.remove_vote("swap", swap_proposal_id)
+
+    def cast_vote_cancel_swap(self, swap_id):
+        verify(self.is_owner() and self.locked)
+        cancels = self.proposals["cancel_swap"]
+        if swap_id in cancels:
+            verify(not cancels[swap_id].passed)
+        else:
+            cancels[swap_id] = Proposal(0, False, self.level, ())
+        self.add_vote("cancel_swap", swap_id)
+        if cancels[swap_id].num_votes == self.num_owners:
+            self.send("cancel_swap", swap_id=swap_id)
+            cancels[swap_id] = cancels[swap_id]._replace(passed=True)
+
+    def cast_undo_vote_cancel_swap(self, swap_id):
+        cancels = self.proposals["cancel_swap"]
+        verify(self.is_owner() and self.locked)
+        verify(swap_id in cancels and not cancels[swap_id].passed)
+        self.remove_vote("cancel_swap", swap_id)
+
+    def cast_vote_sweep(self, sweep_id):
+        sweeps = self.proposals["sweep"]
+        verify(self.is_owner() and self.locked and not self.closed)
+        verify(sweep_id in sweeps and not sweeps[sweep_id].passed)
+        self.add_vote("sweep", sweep_id)
+        if sweeps[sweep_id].num_votes == self.num_owners:
+            for item in sweeps[sweep_id].items:
+                self.send("collect", item.price, swap_id=item.swap_id)
+            sweeps[sweep_id] = sweeps[sweep_id]._replace(passed=True)
+
+    def cast_undo_vote_sweep(self, sweep_id):
+        sweeps = self.proposals["sweep"]
+        verify(self.is_owner() and self.locked and not self.closed)
+        verify(sweep_id in sweeps and not sweeps[sweep_id].passed)
+        self.remove_vote("sweep", sweep_id)
+
+    def add_vote(self, kind, proposal_id):
+        proposal = self.proposals[kind][proposal_id]
+        self.verify_not_expired(proposal)
+        ballot = (proposal_id, self.sender)
+        # Voting twice leaves the tally unchanged
+        if ballot not in self.ballots[kind]:
+            self.ballots[kind].add(ballot)
+            self.proposals[kind][proposal_id] = proposal._replace(num_votes=proposal.num_votes + 1)
+
+    def remove_vote(self, kind, proposal_id):
+        proposal = self.proposals[kind][proposal_id]
+        ballot = (proposal_id, self.sender)
+        # So does undoing a vote that wasn't cast
+        if ballot in self.ballots[kind]:
+            self.ballots[kind].discard(ballot)
+            self.proposals[kind][proposal_id] = proposal._replace(num_votes=proposal.num_votes - 1)
+
+    def is_expired(self, proposal):
+        return self.proposal_lifetime is not None and self.level > proposal.created + self.proposal_lifetime
+
+    def verify_not_expired(self, proposal):
+        verify(not self.is_expired(proposal))
+
+    def prune(self, kind, proposal_id, voters):
+        proposals = self.proposals[kind]
+        verify(proposal_id in proposals)
+        proposal = proposals[proposal_id]
+        if not proposal.passed:
+            verify(self.is_expired(proposal))
+        for voter in voters:
+            ballot = (proposal_id, voter)
+            verify(ballot in self.ballots[kind])
+            self.ballots[kind].discard(ballot)
+        verify(len(voters) == proposal.num_votes)
+        del proposals[proposal_id]
+
+    ### Liquidation Helpers ###
+    def claimable(self, owner, real_total):
+        share = split_tokens(self.equity.get(owner, 0), real_total, self.total_contributed)
+        return sub_mutez(share, self.liquidated_ledger.get(owner, 0))
+
+    def pay_out(self, owner, amount):
+        self.liquidated_ledger[owner] = self.liquidated_ledger.get(owner, 0) + amount
+        self.total_liquidated += amount
+        self.send("transfer", amount, destination=owner)
+
+    ### HEN Contract Functions ###
+    def hen_swap(self, proposal):
+        granted = []
+        for swap in proposal.swaps:
+            if swap.objkt_id not in self.hen_operators:
+                self.hen_operators.add(swap.objkt_id)
+                granted.append(swap.objkt_id)
+        if granted:
+            self.send("update_operators", add=granted)
+        for swap in proposal.swaps:
+            self.send("swap", **swap._asdict())
+
+
+### Invariants ###
+def check_invariants(model):
+    """Return the names of the accounting invariants the state breaks."""
+    broken = []
+    if model.balance < 0:
+        broken.append("balance is negative")
+    if model.total_contributed != sum(model.equity.values()):
+        broken.append("total_contributed differs from the sum of equity")
+    if model.total_liquidated != sum(model.liquidated_ledger.values()):
+        broken.append("total_liquidated differs from the liquidated_ledger")
+    if model.closed and model.total_contributed > 0:
+        real_total = model.balance + model.total_liquidated
+        shares = [
+            split_tokens(model.equity.get(owner, 0), real_total, model.total_contributed)
+            for owner in model.owner_index
+        ]
+        if sum(shares) > real_total:
+            broken.append("owner shares exceed real_total")
+        outstanding = sum(
+            max(share - model.liquidated_ledger.get(owner, 0), 0)
+            for owner, share in zip(model.owner_index, shares)
+        )
+        if outstanding > model.balance:
+            broken.append("claimable payouts exceed the balance")
+    return broken
+
+
+### Fuzzing ###
+OUTSIDER = "tz1hacker"
+
+
+ENTRYPOINTS = (
+    "vote_lock", "vote_close", "default", "deposit", "deposit", "withdraw",
+    "liquidate", "liquidate_all", "vote_buy", "undo_vote_buy", "propose_swap",
+    "propose_swaps", "vote_swap", "undo_vote_swap", "vote_cancel_swap",
+    "undo_vote_cancel_swap", "propose_sweep", "vote_sweep", "undo_vote_sweep",
+    "vote_batch", "revoke_operators", "prune_proposals",
+)
+
+BATCH_VOTES = (
+    "vote_buy", "undo_vote_buy", "vote_swap", "undo_vote_swap",
+    "vote_cancel_swap", "undo_vote_cancel_swap", "vote_sweep", "undo_vote_sweep",
+)
+
+
+def random_operation(rng, model, level):
+    """Pick a plausible random operation for the current state."""
+    # random() scaled down is several times faster than randrange() and choice(),
+    # and generating operations is most of what fuzzing costs
+    random = rng.random
+
+    def below(n):
+        return int(random() * n)
+
+    sender = model.owner_index[below(model.num_owners)] if random() < 0.95 else OUTSIDER
+    amount = 0
+
+    entrypoint = ENTRYPOINTS[below(len(ENTRYPOINTS))]
+    if entrypoint in ("vote_lock", "vote_close"):
+        params = {"vote": random() < 0.9}
+    elif entrypoint == "default":
+        sender = OUTSIDER
+        amount = 1 + below(999)
+        params = {}
+    elif entrypoint == "deposit":
+        amount = below(1000)
+        params = {}
+    elif entrypoint == "withdraw":
+        params = {"withdraw_amount": below(500)}
+    elif entrypoint == "liquidate_all":
+        params = {"start": below(model.num_owners), "limit": 1 + below(model.num_owners)}
+    elif entrypoint == "vote_buy":
+        params = {"swap_id": below(4), "price": below(200)}
+    elif entrypoint in ("undo_vote_buy", "vote_cancel_swap", "undo_vote_cancel_swap"):
+        params = {"swap_id": below(4)}
+    elif entrypoint == "propose_swap":
+        params = {"objkt_amount": 1, "objkt_id": below(3), "xtz_per_objkt": 100, "creator": sender}
+    elif entrypoint == "propose_swaps":
+        params = {"swaps": [Swap(1, below(3), 100, sender) for _ in range(below(3))]}
+    elif entrypoint in ("vote_swap", "undo_vote_swap"):
+        params = {"swap_proposal_id": below(max(model.swap_proposal_id, 1))}
+    elif entrypoint == "propose_sweep":
+        items = [SweepItem(below(4), below(200)) for _ in range(below(4))]
+        params = {"items": items, "cap": sum(item.price for item in items) + below(60) - 10}
+    elif entrypoint in ("vote_sweep", "undo_vote_sweep"):
+        params = {"sweep_id": below(max(model.sweep_proposal_id, 1))}
+    elif entrypoint == "vote_batch":
+        votes = []
+        for _ in range(1 + below(3)):
+            kind = BATCH_VOTES[below(len(BATCH_VOTES))]
+            if kind == "vote_buy":
+                votes.append((kind, (below(4), below(200))))
+            elif kind.endswith("swap"):
+                swap_ids = 4 if kind.endswith("cancel_swap") else max(model.swap_proposal_id, 1)
+                votes.append((kind, below(swap_ids)))
+            elif kind.endswith("sweep"):
+                votes.append((kind, below(max(model.sweep_proposal_id, 1))))
+            else:
+                votes.append((kind, below(4)))
+        params = {"votes": votes}
+    elif entrypoint == "revoke_operators":
+        params = {"token_ids": [below(3)]}
+    elif entrypoint == "prune_proposals":
+        kind = PROPOSAL_KINDS[below(len(PROPOSAL_KINDS))]
+        pid = below({"swap": max(model.swap_proposal_id, 1), "sweep": max(model.sweep_proposal_id, 1)}.get(kind, 4))
+        voters = sorted(voter for (ballot_id, voter) in model.ballots[kind] if ballot_id == pid)
+        params = {"proposals": [(kind, pid, voters)]}
+    else:
+        params = {}
+    return Operation(entrypoint, sender, params, amount, level)
+
+
+def run_sequence(rng, num_owners, length, proposal_lifetime=None):
+    """Run one random sequence, returns (trace, broken invariants)."""
+    owners = ["tz1owner%d" % i for i in range(num_owners)]
+    model = HENDaoModel(owners, proposal_lifetime)
+    trace = []
+    level = 1
+    for _ in range(length):
+        level += int(rng.random() * 3)
+        op = random_operation(rng, model, level)
+        try:
+            model.apply(op)
+            trace.append((op, True))
+        except ContractFailure:
+            trace.append((op, False))
+        broken = check_invariants(model)
+        if broken:
+            return trace, broken
+    return trace, []
+
+
+def fuzz(runs, length, num_owners, seed=0, proposal_lifetime=None, jobs=1):
+    """Fuzz random sequences, returns the first failing (trace, broken) or None.
+
+    With jobs > 1 the runs are split over that many processes, each with its
+    own seed derived from seed, so the sequences differ from a single job.
+    """
+    if jobs <= 1:
+        return fuzz_chunk((runs, length, num_owners, seed, proposal_lifetime))
+
+    chunks = [
+        (runs // jobs + (i < runs % jobs), length, num_owners, "%d/%d" % (seed, i), proposal_lifetime)
+        for i in range(jobs)
+    ]
+    with multiprocessing.Pool(jobs) as pool:
+        for failure in pool.imap_unordered(fuzz_chunk, chunks):
+            if failure is not None:
+                pool.terminate()
+                return failure
+    return None
+
+
+def fuzz_chunk(chunk):
+    runs, length, num_owners, seed, proposal_lifetime = chunk
+    rng = random.Random(seed)
+    for _ in range(runs):
+        trace, broken = run_sequence(rng, num_owners, length, proposal_lifetime)
+        if broken:
+            return trace, broken
+    return None
+
+
+### SmartPy Export ###
+def smartpy_value(value):
+    if isinstance(value, bool):
+        return repr(value)
+    if isinstance(value, int):
+        return "sp.nat(%d)" % value
+    if isinstance(value, str):
+        return 'sp.address("%s")' % value
+    raise TypeError(value)
+
+
+def smartpy_params(op):
+    """Render an operation's parameters as SmartPy call arguments."""
+    p = op.params
+    if op.entrypoint in ("vote_lock", "vote_close"):
+        return repr(p["vote"])
+    if op.entrypoint == "withdraw":
+        return "sp.mutez(%d)" % p["withdraw_amount"]
+    if op.entrypoint == "vote_buy":
+        return "swap_id=sp.nat(%d), price=sp.mutez(%d)" % (p["swap_id"], p["price"])
+    if op.entrypoint == "propose_swap":
+        return "objkt_amount=sp.nat(%d), objkt_id=sp.nat(%d), xtz_per_objkt=sp.mutez(%d), creator=%s" % (
+            p["objkt_amount"], p["objkt_id"], p["xtz_per_objkt"], smartpy_value(p["creator"]))
+    if op.entrypoint == "propose_swaps":
+        return "[%s]" % ", ".join(
+            "sp.record(objkt_amount=sp.nat(%d), objkt_id=sp.nat(%d), xtz_per_objkt=sp.mutez(%d), creator=%s)" % (
+                swap.objkt_amount, swap.objkt_id, swap.xtz_per_objkt, smartpy_value(swap.creator))
+            for swap in p["swaps"])
+    if op.entrypoint == "propose_sweep":
+        return "items=[%s], cap=sp.mutez(%d)" % (", ".join(
+            "sp.record(swap_id=sp.nat(%d), price=sp.mutez(%d))" % item for item in p["items"]), p["cap"])
+    if op.entrypoint == "vote_batch":
+        votes = []
+        for kind, arg in p["votes"]:
+            if kind == "vote_buy":
+                votes.append('sp.variant("vote_buy", sp.record(swap_id=sp.nat(%d), price=sp.mutez(%d)))' % arg)
+            else:
+                votes.append('sp.variant("%s", sp.nat(%d))' % (kind, arg))
+        return "[%s]" % ", ".join(votes)
+    if op.entrypoint == "revoke_operators":
+        return "[%s]" % ", ".join(smartpy_value(token_id) for token_id in p["token_ids"])
+    if op.entrypoint == "prune_proposals":
+        return "[%s]" % ", ".join(
+            'sp.record(proposal=sp.variant("%s", sp.nat(%d)), voters=[%s])' % (
+                kind, proposal_id, ", ".join(smartpy_value(voter) for voter in voters))
+            for kind, proposal_id, voters in p["proposals"])
+    # Single parameter entrypoints take the value itself
+    if len(p) == 1:
+        return smartpy_value(next(iter(p.values())))
+    return ", ".join("%s=%s" % (key, smartpy_value(value)) for key, value in sorted(p.items()))
+
+
+def to_smartpy_scenario(trace, num_owners, name="test_model_trace", contract="contract.py", proposal_lifetime=None):
+    """Render a trace as a SmartPy test that replays it against HENDao.
+
+    The test checks every operation succeeds or fails like it did in the model
+    and compares the accounting state at the end.
+    """
+    owners = ["tz1owner%d" % i for i in range(num_owners)]
+    model = HENDaoModel(owners, proposal_lifetime)
+    for op, _ in trace:
+        try:
+            model.apply(op)
+        except ContractFailure:
+            pass
+
+    lines = [
+        "import smartpy as sp",
+        "",
+        'dao = sp.io.import_script_from_url("file:%s")' % contract,
+        "",
+        '@sp.add_test(name = "%s")' % name,
+        "def test():",
+        "    c1 = dao.HENDao([%s], proposal_lifetime=%r)" % (", ".join(smartpy_value(o) for o in owners), proposal_lifetime),
+        "    scenario = sp.test_scenario()",
+        "    scenario += c1",
+    ]
+    for op, valid in trace:
+        params = "" if op.entrypoint in ("default", "deposit", "liquidate") else smartpy_params(op)
+        lines.append("    c1.%s(%s).run(sender=%s, amount=sp.mutez(%d), level=%d, valid=%r)" % (
+            op.entrypoint, params, smartpy_value(op.sender), op.amount, op.level, valid))
+
+    lines.append("    scenario.verify(c1.balance == sp.mutez(%d))" % model.balance)
+    lines.append("    scenario.verify(c1.data.total_contributed == sp.mutez(%d))" % model.total_contributed)
+    lines.append("    scenario.verify(c1.data.total_liquidated == sp.mutez(%d))" % model.total_liquidated)
+    for owner, paid in sorted(model.liquidated_ledger.items()):
+        lines.append("    scenario.verify(c1.data.liquidated_ledger[%s] == sp.mutez(%d))" % (smartpy_value(owner), paid))
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuzz the HENDao reference model")
+    parser.add_argument("--runs", type=int, default=10000)
+    parser.add_argument("--length", type=int, default=50)
+    parser.add_argument("--owners", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--proposal-lifetime", type=int, default=None)
+    parser.add_argument("--jobs", type=int, default=1, help="processes to fuzz in, 0 for one per CPU")
+    parser.add_argument("--export", help="write the first failing trace as a SmartPy scenario")
+    args = parser.parse_args(argv)
+
+    jobs = args.jobs or multiprocessing.cpu_count()
+    start = time.perf_counter()
+    failure = fuzz(args.runs, args.length, args.owners, args.seed, args.proposal_lifetime, jobs)
+    elapsed = time.perf_counter() - start
+    if failure is None:
+        print("%d sequences, no invariant broken (%.0f sequences/s)" % (args.runs, args.runs / elapsed))
+        return 0
+
+    trace, broken = failure
+    print("invariant broken after %d operations: %s" % (len(trace), "; ".join(broken)))
+    if args.export:
+        with open(args.export, "w") as f:
+            f.write(to_smartpy_scenario(trace, args.owners, proposal_lifetime=args.proposal_lifetime))
+        print("trace written to %s" % args.export)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""Resolve objkt ids to the swap_id and price that vote_buy needs.
+
+Looks up many objkt ids at once, concurrently, and caches the answers in
+memory and on disk so bots polling the same candidates don't hit the lookup
+service again for every objkt:
+
+    python resolver.py 67545 67546 --cache resolver.sqlite
+    python resolver.py 67545 67546 --fixture fixtures/listings.json --format michelson
+
+The JSON output holds the parameters for one vote_buy per objkt and for a
+single vote_batch covering all of them, in Michelson JSON like the indexer's
+operation log. --format michelson prints one vote_buy argument per line for
+octez-client --arg.
+
+Backends only need an async fetch(objkt_ids) returning {objkt_id: Listing or
+None}, so tests and local runs can use FixtureBackend or a stub server
+behind HTTPBackend.
+"""
+
+import argparse
+import asyncio
+import collections
+import http.client
+import json
+import sqlite3
+import sys
+import time
+import urllib.parse
+
+# The lookup service linked from the README
+DEFAULT_URL = "https://51rknuvw76.execute-api.us-east-1.amazonaws.com/dev/objkt?id={objkt_id}"
+
+# Cheapest swap of an objkt, price in mutez
+Listing = collections.namedtuple("Listing", ["objkt_id", "swap_id", "price"])
+
+
+### Backends ###
+def listing_from(objkt_id, data):
+    """Read {"swap_id": ..., "price": ...}, missing or null fields mean nothing is for sale."""
+    if not data or data.get("swap_id") is None or data.get("price") is None:
+        return None
+    return Listing(objkt_id, int(data["swap_id"]), int(data["price"]))
+
+
+def parse_listing(objkt_id, body):
+    """Read a lookup response, pass another parse to HTTPBackend for other services."""
+    return listing_from(objkt_id, json.loads(body))
+
+
+class HTTPBackend:
+    """Looks each objkt up over HTTP with a pool of keep-alive connections.
+
+    http.client is blocking, so each request runs in the default executor
+    and holds one pooled connection, at most `connections` at a time.
+    """
+
+    def __init__(self, url=DEFAULT_URL, connections=8, timeout=10, parse=parse_listing):
+        self.url = url
+        self.timeout = timeout
+        self.parse = parse
+        parsed = urllib.parse.urlsplit(url)
+        self.scheme = parsed.scheme
+        self.host = parsed.netloc
+        # Kept across fetches, so later lookups reuse the same connections
+        self.connections = [self.connect() for _ in range(connections)]
+
+    def connect(self):
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def request(self, connection, objkt_id):
+        parsed = urllib.parse.urlsplit(self.url.format(objkt_id=objkt_id))
+        path = parsed.path + ("?" + parsed.query if parsed.query else "")
+        # A kept-alive connection the server closed fails on first use, retry once on a fresh one
+        for attempt in range(2):
+            try:
+                connection.request("GET", path, headers={"Connection": "keep-alive"})
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if attempt:
+                    raise
+        if response.status == 404:
+            return None
+        if response.status != 200:
+            raise RuntimeError("lookup of objkt %d failed with HTTP %d" % (objkt_id, response.status))
+        return self.parse(objkt_id, body)
+
+    async def fetch_one(self, pool, objkt_id):
+        connection = await pool.get()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.request, connection, objkt_id)
+        finally:
+            pool.put_nowait(connection)
+
+    async def fetch(self, objkt_ids):
+        # The queue belongs to the running event loop, the connections don't
+        pool = asyncio.Queue()
+        for connection in self.connections:
+            pool.put_nowait(connection)
+        listings = await asyncio.gather(*(self.fetch_one(pool, objkt_id) for objkt_id in objkt_ids))
+        return dict(zip(objkt_ids, listings))
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+
+
+class FixtureBackend:
+    """Answers from a JSON file of {objkt_id: {"swap_id": ..., "price": ...}}."""
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.listings = {
+                int(objkt_id): listing_from(int(objkt_id), data)
+                for objkt_id, data in json.load(f).items()
+            }
+        self.fetched = []
+
+    async def fetch(self, objkt_ids):
+        self.fetched += objkt_ids
+        return {objkt_id: self.listings.get(objkt_id) for objkt_id in objkt_ids}
+
+    def close(self):
+        pass
+
+
+### Caches ###
+class MemoryCache:
+    """LRU cache whose entries expire ttl seconds after they were stored."""
+
+    def __init__(self, size=4096, ttl=60, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = collections.OrderedDict()
+
+    def get(self, objkt_id):
+        """Returns (found, listing), listing is None for objkts with no swap."""
+        entry = self.entries.get(objkt_id)
+        if entry is None:
+            return False, None
+        stored, listing = entry
+        if self.clock() - stored > self.ttl:
+            del self.entries[objkt_id]
+            return False, None
+        self.entries.move_to_end(objkt_id)
+        return True, listing
+
+    def put(self, objkt_id, listing, stored=None):
+        """stored is when the answer was fetched on this cache's clock, now if None."""
+        self.entries[objkt_id] = (self.clock() if stored is None else stored, listing)
+        self.entries.move_to_end(objkt_id)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class DiskCache:
+    """The same cache in SQLite, so it survives between runs."""
+
+    def __init__(self, path, ttl=300, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            " objkt_id INTEGER PRIMARY KEY, swap_id INTEGER, price INTEGER, stored REAL NOT NULL)"
+        )
+
+    def get_many(self, objkt_ids):
+        """Returns {objkt_id: (stored, listing)} for the fresh entries only."""
+        found = {}
+        oldest = self.clock() - self.ttl
+        # Stay under SQLite's bound parameter limit
+        for i in range(0, len(objkt_ids), 500):
+            chunk = objkt_ids[i:i + 500]
+            rows = self.db.execute(
+                "SELECT objkt_id, swap_id, price, stored FROM listings WHERE stored >= ? AND objkt_id IN (%s)"
+                % ", ".join("?" * len(chunk)),
+                [oldest] + list(chunk)
+            )
+            for objkt_id, swap_id, price, stored in rows:
+                found[objkt_id] = (stored, None if swap_id is None else Listing(objkt_id, swap_id, price))
+        return found
+
+    def put_many(self, listings):
+        now = self.clock()
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)",
+                [
+                    (objkt_id, listing and listing.swap_id, listing and listing.price, now)
+                    for objkt_id, listing in listings.items()
+                ]
+            )
+
+    def close(self):
+        self.db.close()
+
+
+### Resolver ###
+class Resolver:
+    """Bulk objkt lookups through the memory cache, the disk cache, then the backend."""
+
+    def __init__(self, backend, memory_cache=None, disk_cache=None):
+        self.backend = backend
+        self.memory_cache = memory_cache if memory_cache is not None else MemoryCache()
+        self.disk_cache = disk_cache
+
+    async def resolve(self, objkt_ids):
+        """Returns {objkt_id: Listing or None} in the order asked for."""
+        objkt_ids = list(dict.fromkeys(objkt_ids))
+        result = {}
+        missing = []
+        for objkt_id in objkt_ids:
+            found, listing = self.memory_cache.get(objkt_id)
+            if found:
+                result[objkt_id] = listing
+            else:
+                missing.append(objkt_id)
+
+        if missing and self.disk_cache is not None:
+            cached = self.disk_cache.get_many(missing)
+            # Keep the age from disk so a promoted answer doesn't outlive its ttl,
+            # the two caches run on different clocks
+            now = self.disk_cache.clock()
+            for objkt_id, (stored, listing) in cached.items():
+                self.memory_cache.put(objkt_id, listing, self.memory_cache.clock() - (now - stored))
+                result[objkt_id] = listing
+            missing = [objkt_id for objkt_id in missing if objkt_id not in cached]
+
+        if missing:
+            fetched = await self.backend.fetch(missing)
+            for objkt_id, listing in fetched.items():
+                self.memory_cache.put(objkt_id, listing)
+            if self.disk_cache is not None:
+                self.disk_cache.put_many(fetched)
+            result.update(fetched)
+
+        return {objkt_id: result[objkt_id] for objkt_id in objkt_ids}
+
+    def resolve_sync(self, objkt_ids):
+        return asyncio.run(self.resolve(objkt_ids))
+
+    def close(self):
+        self.backend.close()
+        if self.disk_cache is not None:
+            self.disk_cache.close()
+
+
+### vote_buy Parameters ###
+def for_sale(listings):
+    """Drop the objkts that have no swap for sale."""
+    return [listing for listing in listings.values() if listing is not None]
+
+
+def vote_buy_params(listings):
+    """One vote_buy parameter per listing, in Michelson JSON."""
+    return [{"swap_id": str(listing.swap_id), "price": str(listing.price)} for listing in for_sale(listings)]
+
+
+def vote_batch_params(listings):
+    """A vote_batch parameter voting for every listing."""
+    return [{"vote_buy": params} for params in vote_buy_params(listings)]
+
+
+def vote_buy_michelson(listing):
+    # (price, swap_id), same layout as bench.py
+    return "Pair %d %d" % (listing.price, listing.swap_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve objkt ids to vote_buy parameters")
+    parser.add_argument("objkt_ids", type=int, nargs="+")
+    parser.add_argument("--url", default=DEFAULT_URL, help="lookup URL with an {objkt_id} placeholder")
+    parser.add_argument("--fixture", help="answer from a JSON fixture instead of HTTP")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--cache", help="SQLite file for the persistent cache")
+    parser.add_argument("--ttl", type=float, default=300, help="seconds a cached answer stays valid")
+    parser.add_argument("--format", choices=["json", "michelson"], default="json")
+    args = parser.parse_args(argv)
+
+    backend = FixtureBackend(args.fixture) if args.fixture else HTTPBackend(args.url, args.connections)
+    disk_cache = DiskCache(args.cache, args.ttl) if args.cache else None
+    resolver = Resolver(backend, MemoryCache(ttl=args.ttl), disk_cache)
+    try:
+        listings = resolver.resolve_sync(args.objkt_ids)
+    finally:
+        resolver.close()
+
+    for objkt_id, listing in listings.items():
+        if listing is None:
+            print("objkt %d has no swap for sale" % objkt_id, file=sys.stderr)
+
+    if args.format == "json":
+        print(json.dumps({"vote_buy": vote_buy_params(listings), "vote_batch": vote_batch_params(listings)}, indent=2))
+    else:
+        for listing in for_sale(listings):
+            print(vote_buy_michelson(listing))
+
+
+if __name__ == "__main__":
+    main()
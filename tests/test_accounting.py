@@ -0,0 +1,68 @@
+import os
+import random
+
+import numpy as np
+
+import accounting
+import model
+from accounting import History, final_state, replay
+from conftest import ROOT
+
+EVENTS = os.path.join(ROOT, "fixtures", "events.jsonl")
+
+
+def test_replay_fixture():
+    history = History.load(EVENTS)
+    state = final_state(history, replay(history))
+    assert state["equity"] == {"tz1owner1": 15, "tz1owner2": 45}
+    assert state["total_contributed"] == 60
+    assert state["liquidated_ledger"] == {"tz1owner1": 35, "tz1owner2": 0}
+
+
+def random_split_args(rng, count, bits):
+    """Arguments whose result fits in mutez, quantity at most twice the total."""
+    total = [rng.randrange(1, 2 ** bits) for _ in range(count)]
+    amount = [rng.randrange(0, 2 ** bits) for _ in range(count)]
+    quantity = [rng.randrange(0, 2 * t + 1) for t in total]
+    return amount, quantity, total
+
+
+def check_split_tokens(amount, quantity, total):
+    result = accounting.split_tokens(
+        np.array(amount, dtype=np.int64), np.array(quantity, dtype=np.int64), np.array(total, dtype=np.int64)
+    )
+    assert result.tolist() == [model.split_tokens(a, q, t) for a, q, t in zip(amount, quantity, total)]
+
+
+def test_split_tokens_matches_model():
+    rng = random.Random(0)
+    for _ in range(200):
+        amount, quantity, total = random_split_args(rng, 16, 31)
+        assert max(a * q for a, q in zip(amount, quantity)) <= accounting.INT64_MAX
+        check_split_tokens(amount, quantity, total)
+
+
+def test_split_tokens_matches_model_past_int64():
+    rng = random.Random(1)
+    for _ in range(200):
+        amount, quantity, total = random_split_args(rng, 16, 61)
+        # Make sure every round takes the exact integer path
+        amount[0], quantity[0], total[0] = 2 ** 61, 2 ** 62, 2 ** 61
+        assert max(a * q for a, q in zip(amount, quantity)) > accounting.INT64_MAX
+        check_split_tokens(amount, quantity, total)
+
+
+def test_split_tokens_zero_total():
+    result = accounting.split_tokens(np.array([5, 7]), np.array([3, 3]), np.array([0, 2]))
+    assert result.tolist() == [0, 10]
+
+
+def test_empty_history(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_text("")
+    history = History.load(str(path))
+    assert final_state(history, replay(history)) == {"equity": {}, "total_contributed": 0, "liquidated_ledger": {}}
+
+    out = tmp_path / "payouts.csv"
+    accounting.main([str(path), "--out", str(out)])
+    assert out.read_text().strip() == ",".join(accounting.COLUMNS)
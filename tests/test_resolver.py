@@ -0,0 +1,113 @@
+import os
+
+from conftest import ROOT
+from resolver import DiskCache, FixtureBackend, Listing, MemoryCache, Resolver
+
+FIXTURE = os.path.join(ROOT, "fixtures", "listings.json")
+
+
+class Clock:
+    """A clock tests move by hand."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_hit():
+    backend = FixtureBackend(FIXTURE)
+    resolver = Resolver(backend)
+    first = resolver.resolve_sync([67545, 67546])
+    second = resolver.resolve_sync([67546, 67545])
+    assert first[67545] == Listing(67545, 412303, 5000000)
+    assert second == first
+    assert backend.fetched == [67545, 67546]
+
+
+def test_disk_hit(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    resolver = Resolver(FixtureBackend(FIXTURE), disk_cache=DiskCache(path))
+    resolver.resolve_sync([67545])
+    resolver.close()
+
+    # A new run starts with an empty memory cache
+    backend = FixtureBackend(FIXTURE)
+    resolver = Resolver(backend, disk_cache=DiskCache(path))
+    assert resolver.resolve_sync([67545]) == {67545: Listing(67545, 412303, 5000000)}
+    assert backend.fetched == []
+    assert resolver.memory_cache.get(67545) == (True, Listing(67545, 412303, 5000000))
+    resolver.close()
+
+
+def test_backend_miss():
+    backend = FixtureBackend(FIXTURE)
+    resolver = Resolver(backend)
+    assert resolver.resolve_sync([99999]) == {99999: None}
+    assert backend.fetched == [99999]
+
+
+def test_memory_ttl_expiry():
+    clock = Clock()
+    backend = FixtureBackend(FIXTURE)
+    resolver = Resolver(backend, MemoryCache(ttl=60, clock=clock))
+    resolver.resolve_sync([67545])
+    clock.now += 60
+    resolver.resolve_sync([67545])
+    assert backend.fetched == [67545]
+    clock.now += 1
+    resolver.resolve_sync([67545])
+    assert backend.fetched == [67545, 67545]
+
+
+def test_disk_ttl_expiry(tmp_path):
+    clock = Clock()
+    disk_cache = DiskCache(str(tmp_path / "cache.sqlite"), ttl=300, clock=clock)
+    disk_cache.put_many({67545: Listing(67545, 412303, 5000000)})
+    clock.now += 301
+    assert disk_cache.get_many([67545]) == {}
+    disk_cache.close()
+
+
+def test_promoted_entry_keeps_its_age(tmp_path):
+    disk_clock, memory_clock = Clock(), Clock(5.0)
+    disk_cache = DiskCache(str(tmp_path / "cache.sqlite"), ttl=300, clock=disk_clock)
+    disk_cache.put_many({67545: Listing(67545, 412303, 5000000)})
+    disk_clock.now += 250
+
+    backend = FixtureBackend(FIXTURE)
+    resolver = Resolver(backend, MemoryCache(ttl=300, clock=memory_clock), disk_cache)
+    resolver.resolve_sync([67545])
+    assert backend.fetched == []
+
+    # Stored 250 seconds ago on disk, so it only has 50 left in memory
+    memory_clock.now += 51
+    assert resolver.memory_cache.get(67545) == (False, None)
+    resolver.close()
+
+
+def test_lru_eviction():
+    cache = MemoryCache(size=2)
+    cache.put(1, None)
+    cache.put(2, None)
+    cache.get(1)
+    cache.put(3, None)
+    assert cache.get(2) == (False, None)
+    assert cache.get(1) == (True, None)
+    assert cache.get(3) == (True, None)
+
+
+def test_cached_none(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    backend = FixtureBackend(FIXTURE)
+    resolver = Resolver(backend, disk_cache=DiskCache(path))
+    assert resolver.resolve_sync([67547]) == {67547: None}
+    assert resolver.resolve_sync([67547]) == {67547: None}
+    resolver.close()
+
+    backend = FixtureBackend(FIXTURE)
+    resolver = Resolver(backend, disk_cache=DiskCache(path))
+    assert resolver.resolve_sync([67547]) == {67547: None}
+    assert backend.fetched == []
+    resolver.close()